@@ -1,130 +1,1662 @@
+import csv
+import gzip
 import heapq
-from collections import defaultdict, deque
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него работают чистые версии
+    np = None
+
+CHUNK_SIZE = 1 << 20  # Размер блока при чтении файла ребер
+
+GZIP_MAGIC = b'\x1f\x8b'
+# Двоичный формат ребер: сигнатура, затем записи (u, v, weight)
+# как int64, int64, float64 little-endian
+BINARY_EDGES_MAGIC = b'EDGEBIN1'
+BINARY_EDGE = struct.Struct('<qqd')
+
+# Снимок графа (Graph.save_binary): заголовок - сигнатура, ориентированность,
+# число вершин, ребер, дуг смежности и длина блока меток в байтах
+SNAPSHOT_MAGIC = b'GRAPHSN1'
+SNAPSHOT_HEADER = struct.Struct('<8s?7xqqqq')
+
+# Заполнение матрицы смежности (доля ненулевых клеток), начиная с которого
+# all_pairs_shortest_paths выбирает Флойда-Уоршелла вместо Дейкстры
+APSP_DENSITY = 0.1
+
+# Размер фронта, начиная с которого bfs_levels делит его между процессами
+PARALLEL_FRONTIER = 1 << 16
+
+# Число ребер, начиная с которого Борувка делит раунды между процессами
+PARALLEL_EDGES = 1 << 16
+
+# Бюджет памяти кэша результатов Дейкстры (PathCache) по умолчанию
+PATH_CACHE_BYTES = 64 << 20
+
+# Форматы Graph.export_matrix и сколько символов копить перед одной записью
+EXPORT_FORMATS = ("text", "csv", "mtx")
+EXPORT_BLOCK = 1 << 16
+
+
+def save_binary_edges(filename, edges):
+    """
+    Запись ребер (u, v, weight) в двоичный формат, который понимает
+    Graph.load_from_file. Метки вершин должны быть целыми числами
+    (или строками из цифр).
+    """
+    with open(filename, 'wb') as f:
+        f.write(BINARY_EDGES_MAGIC)
+        pack = BINARY_EDGE.pack
+        for u, v, weight in edges:
+            f.write(pack(int(u), int(v), float(weight)))
+
+
+def _to_array(typecode, values):
+    """Копия одномерного ndarray в array.array"""
+    dtype = np.float64 if typecode == 'd' else np.int64
+    result = array(typecode)
+    result.frombytes(np.ascontiguousarray(values, dtype=dtype).tobytes())
+    return result
+
+
+def _inverse(order):
+    """Обратная перестановка: position[order[p]] = p"""
+    position = array('q', bytes(8 * len(order)))
+    for p, u in enumerate(order):
+        position[u] = p
+    return position
+
+
+def _permute(typecode, values, order):
+    """array значений по номерам вершин в порядке order (get_vertex_labels)"""
+    return array(typecode, map(values.__getitem__, order))
+
+
+def _minplus_update(dist, nxt, col_dist, col_next, row_dist):
+    """
+    Шаги Флойда-Уоршелла над блоком: для каждого k из блока
+    dist = minimum(dist, col_dist[:, k] + row_dist[k, :]),
+    а там, где путь улучшился, nxt берется из col_next[:, k].
+    Массивы могут совпадать: строка и столбец k на шаге k не меняются.
+    """
+    for k in range(row_dist.shape[0]):
+        candidate = col_dist[:, k, None] + row_dist[None, k, :]
+        if nxt is None:
+            np.minimum(dist, candidate, out=dist)
+        else:
+            better = candidate < dist
+            np.copyto(dist, candidate, where=better)
+            np.copyto(nxt, np.broadcast_to(col_next[:, k, None], nxt.shape),
+                      where=better)
+
+
+def _blocked_floyd_warshall(dist, nxt, block):
+    """
+    Блочный Флойд-Уоршелл (три фазы на каждый диагональный блок):
+    1) диагональный блок K x K;
+    2) полоса строк K и полоса столбцов K через готовый диагональный блок;
+    3) остальные полосы строк по готовым полосам из фазы 2.
+    Одновременно в памяти - несколько полос по block x n элементов,
+    поэтому dist и nxt могут быть np.memmap на диске.
+    """
+    n = dist.shape[0]
+    for kb in range(0, n, block):
+        K = slice(kb, min(kb + block, n))
+        # Фаза 1
+        diag = np.array(dist[K, K])
+        ndiag = None if nxt is None else np.array(nxt[K, K])
+        _minplus_update(diag, ndiag, diag, ndiag, diag)
+
+        # Фаза 2
+        row = np.array(dist[K, :])
+        nrow = None if nxt is None else np.array(nxt[K, :])
+        _minplus_update(row, nrow, diag, ndiag, row)
+        dist[K, :] = row
+        if nxt is not None:
+            nxt[K, :] = nrow
+        col = np.array(dist[:, K])
+        ncol = None if nxt is None else np.array(nxt[:, K])
+        _minplus_update(col, ncol, col, ncol, diag)
+        dist[:, K] = col
+        if nxt is not None:
+            nxt[:, K] = ncol
+
+        # Фаза 3
+        for ib in range(0, n, block):
+            if ib == kb:
+                continue
+            I = slice(ib, min(ib + block, n))
+            strip = np.array(dist[I, :])
+            nstrip = None if nxt is None else np.array(nxt[I, :])
+            _minplus_update(strip, nstrip, col[I], None if ncol is None else ncol[I], row)
+            dist[I, :] = strip
+            if nxt is not None:
+                nxt[I, :] = nstrip
+
+
+def _unwind(predecessors, v):
+    """Путь до вершины v по словарю предков: от начала поиска до v"""
+    path = [v]
+    while v in predecessors:
+        v = predecessors[v]
+        path.append(v)
+    path.reverse()
+    return path
+
+
+def _dijkstra_distances(source, adj_start, adj_end, target, weights, predecessors=None):
+    """
+    Дейкстра по плоским массивам смежности (см. Graph): список расстояний
+    от вершины source до всех вершин по их номерам. Если передан список
+    predecessors, в него записываются предки вершин на кратчайших путях.
+    """
+    distances = [float('inf')] * len(adj_start)
+    distances[source] = 0
+    heap = [(0, source)]
+
+    while heap:
+        current_dist, u = heapq.heappop(heap)
+
+        if current_dist > distances[u]:
+            continue
+
+        for k in range(adj_start[u], adj_end[u]):
+            v = target[k]
+            distance = current_dist + weights[k]
+            if distance < distances[v]:
+                distances[v] = distance
+                if predecessors is not None:
+                    predecessors[v] = u
+                heapq.heappush(heap, (distance, v))
+
+    return distances
+
+
+# Смежность графа в процессе-исполнителе all_pairs_shortest_paths:
+# (разделяемая память, начала, концы, соседи, веса)
+_shared_adjacency = None
+
+
+def _attach_shared_adjacency(name, n, size):
+    """
+    Инициализатор процесса-исполнителя: подключается к разделяемой памяти
+    со смежностью графа и смотрит на нее через memoryview без копирования
+    """
+    global _shared_adjacency
+    shm = SharedMemory(name=name)
+    view = shm.buf
+    _shared_adjacency = (
+        shm,
+        view[:8 * n].cast('q'),
+        view[8 * n:16 * n].cast('q'),
+        view[16 * n:16 * n + 8 * size].cast('q'),
+        view[16 * n + 8 * size:16 * n + 16 * size].cast('d'),
+    )
+
+
+def _dijkstra_rows(sources):
+    """Задача исполнителя: строки расстояний для номеров вершин sources"""
+    _, adj_start, adj_end, target, weights = _shared_adjacency
+    return [array('d', _dijkstra_distances(source, adj_start, adj_end, target, weights))
+            for source in sources]
+
+
+def _gather_frontier(frontier, start, end, target, hops):
+    """
+    Векторный шаг поуровневого BFS: соседи всех вершин frontier
+    (ndarray номеров), у которых еще нет расстояния в hops, и вершины
+    фронта, из которых они достигнуты. Номера дуг всех строк фронта
+    собираются одной выборкой без цикла по вершинам.
+    """
+    first = start[frontier]
+    counts = end[frontier] - first
+    total = int(counts.sum())
+    if not total:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    offsets = np.cumsum(counts) - counts
+    arcs = np.arange(total) + np.repeat(first - offsets, counts)
+    neighbors = target[arcs]
+    fresh = hops[neighbors] < 0
+    return neighbors[fresh], np.repeat(frontier, counts)[fresh]
+
+
+# Смежность и расстояния в процессе-исполнителе bfs_levels:
+# (разделяемая память, начала, концы, соседи, расстояния)
+_shared_frontier = None
+
+
+def _attach_shared_frontier(name, n, size):
+    """
+    Инициализатор процесса-исполнителя BFS: массивы смежности и
+    расстояний (их обновляет главный процесс) - ndarray поверх
+    разделяемой памяти
+    """
+    global _shared_frontier
+    shm = SharedMemory(name=name)
+    arrays = np.ndarray((3 * n + size,), dtype=np.int64, buffer=shm.buf)
+    _shared_frontier = (shm, arrays[:n], arrays[n:2 * n],
+                        arrays[2 * n:2 * n + size], arrays[2 * n + size:])
+
+
+def _gather_shared(frontier):
+    """Задача исполнителя BFS: шаг _gather_frontier для части фронта"""
+    _, start, end, target, hops = _shared_frontier
+    return _gather_frontier(frontier, start, end, target, hops)
+
+
+def _segment_append(adjacency, u, v, weight, edge_id):
+    """
+    Добавляет дугу u -> v в плоские массивы смежности
+    (начала, концы, емкости, соседи, веса, номера ребер).
+    Строка вершины занимает [start, start + cap); если она заполнена,
+    переносится в конец массивов с удвоенной емкостью - O(1) в среднем.
+    Возвращает True, если строка переносилась.
+    """
+    start, end, cap, target, weights, edges = adjacency
+    k = end[u]
+    moved = k == start[u] + cap[u]
+    if moved:
+        size = k - start[u]
+        extra = max(4, size)
+        base = len(target)
+        target += target[start[u]:k] + array('q', bytes(8 * extra))
+        weights += weights[start[u]:k] + array('d', bytes(8 * extra))
+        edges += edges[start[u]:k] + array('q', bytes(8 * extra))
+        start[u] = base
+        cap[u] = size + extra
+        k = base + size
+    target[k] = v
+    weights[k] = weight
+    edges[k] = edge_id
+    end[u] = k + 1
+    return moved
+
+
+def _segment_remove(adjacency, u, edge_id):
+    """
+    Удаляет из строки u одну дугу ребра edge_id за O(степени):
+    на ее место переносится последняя дуга строки. Поиск идет с конца
+    строки, поэтому последняя дуга снимается за O(1)
+    """
+    start, end, _, target, weights, edges = adjacency
+    last = end[u] - 1
+    for k in range(last, start[u] - 1, -1):
+        if edges[k] == edge_id:
+            target[k] = target[last]
+            weights[k] = weights[last]
+            edges[k] = edges[last]
+            end[u] = last
+            return
+    raise KeyError(edge_id)
+
+
+def _segment_sort(adjacency, u):
+    """Упорядочивает дуги строки u по номерам ребер за O(d log d)"""
+    start, end, _, target, weights, edges = adjacency
+    first, stop = start[u], end[u]
+    arcs = sorted(zip(edges[first:stop], target[first:stop], weights[first:stop]))
+    for k, (edge_id, v, weight) in enumerate(arcs, first):
+        edges[k], target[k], weights[k] = edge_id, v, weight
+
+
+def _segment_update(adjacency, u, edge_id, new_id=None, old_target=None,
+                    new_target=None, weight=None):
+    """
+    Меняет в строке u дуги ребра edge_id: номер ребра на new_id,
+    соседа old_target на new_target, вес на weight (что задано)
+    """
+    start, end, _, target, weights, edges = adjacency
+    for k in range(start[u], end[u]):
+        if edges[k] == edge_id:
+            if new_id is not None:
+                edges[k] = new_id
+            if old_target is not None and target[k] == old_target:
+                target[k] = new_target
+            if weight is not None:
+                weights[k] = weight
+
+
+# Ребра графа и номера компонент в процессе-исполнителе Борувки:
+# (разделяемая память, концы u, концы v, веса, компоненты вершин)
+_shared_edges = None
+
+
+def _attach_shared_edges(name, m, n):
+    """
+    Инициализатор процесса-исполнителя Борувки: массивы ребер и номеров
+    компонент читаются из разделяемой памяти без копирования
+    """
+    global _shared_edges
+    shm = SharedMemory(name=name)
+    view = shm.buf
+    _shared_edges = (
+        shm,
+        view[:8 * m].cast('q'),
+        view[8 * m:16 * m].cast('q'),
+        view[16 * m:24 * m].cast('d'),
+        view[24 * m:24 * m + 8 * n].cast('q'),
+    )
+
+
+def _cheapest_edges(first, last, edge_u, edge_v, edge_w, component):
+    """
+    Шаг Борувки для ребер first..last-1: для каждой компоненты -
+    самое легкое выходящее из нее ребро {компонента: (вес, номер ребра)}.
+    Номер ребра разрешает равенство весов, поэтому выбор согласован
+    между компонентами и не создает циклов.
+    """
+    best = {}
+    for e in range(first, last):
+        a = component[edge_u[e]]
+        b = component[edge_v[e]]
+        if a == b:
+            continue
+        key = (edge_w[e], e)
+        for c in (a, b):
+            old = best.get(c)
+            if old is None or key < old:
+                best[c] = key
+    return best
+
+
+def _cheapest_edges_shared(first, last):
+    """Задача исполнителя Борувки над разделяемыми массивами"""
+    _, edge_u, edge_v, edge_w, component = _shared_edges
+    return _cheapest_edges(first, last, edge_u, edge_v, edge_w, component)
+
+
+class DisjointSet:
+    """
+    Система непересекающихся множеств над номерами 0..n-1:
+    предки в array('q'), ранги в bytearray, сжатие путей
+    делением пополам и объединение по рангу
+    """
+    def __init__(self, n):
+        self.parent = array('q', range(n))
+        self.rank = bytearray(n)
+
+    def add(self):
+        """Добавляет одноэлементное множество с номером n"""
+        self.parent.append(len(self.parent))
+        self.rank.append(0)
+
+    def find(self, u):
+        """Представитель множества, содержащего u"""
+        parent = self.parent
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    def union(self, u, v):
+        """Объединяет множества u и v; False, если они уже совпадали"""
+        root_u = self.find(u)
+        root_v = self.find(v)
+
+        if root_u == root_v:
+            return False
+
+        rank = self.rank
+        if rank[root_u] > rank[root_v]:
+            self.parent[root_v] = root_u
+        elif rank[root_u] < rank[root_v]:
+            self.parent[root_u] = root_v
+        else:
+            self.parent[root_v] = root_u
+            rank[root_u] += 1
+        return True
+
+
+class PathCache:
+    """
+    LRU-кэш результатов Дейкстры от одной вершины:
+    номер источника -> (расстояния array('d'), предки array('q')),
+    предок -1 - у источника и недостижимых вершин.
+    Суммарный размер массивов не превышает max_bytes (0 - кэш выключен);
+    при переполнении вытесняются давно не использованные источники.
+    hits и misses - счетчики попаданий и промахов, clear() их не сбрасывает.
+    """
+    def __init__(self, max_bytes=PATH_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, source):
+        return source in self._entries
+
+    def get(self, source):
+        """Результат для source или None; учитывается в hits/misses"""
+        entry = self._entries.get(source)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(source)
+        self.hits += 1
+        return entry
+
+    def put(self, source, distances, predecessors):
+        """Сохраняет результат, вытесняя старые, пока не хватит места"""
+        size = _nbytes(distances) + _nbytes(predecessors)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(source, None)
+        if old is not None:
+            self.nbytes -= _nbytes(old[0]) + _nbytes(old[1])
+        while self.nbytes + size > self.max_bytes:
+            _, (d, p) = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(d) + _nbytes(p)
+        self._entries[source] = (distances, predecessors)
+        self.nbytes += size
+
+    def clear(self):
+        """Сбрасывает все результаты (граф изменился)"""
+        self._entries.clear()
+        self.nbytes = 0
+
+
+def _nbytes(values):
+    """Размер данных массива array в байтах"""
+    return values.itemsize * len(values)
+
+
+class CSRMatrix:
+    """
+    Разреженная матрица в формате CSR (compressed sparse row).
+    Ненулевые элементы строки i лежат в indices[indptr[i]:indptr[i + 1]]
+    (номера столбцов по возрастанию) и data[...] (значения).
+    Память - O(n + nnz) вместо O(n^2) у плотной матрицы.
+    labels - метки строк (вершин графа).
+    """
+    def __init__(self, shape, indptr, indices, data, labels=None):
+        self.shape = shape
+        self.indptr = indptr    # array('q') длины n + 1
+        self.indices = indices  # array('q') длины nnz
+        self.data = data        # array('d') длины nnz
+        self.labels = labels
+
+    @classmethod
+    def from_rows(cls, rows, ncols, labels=None):
+        """
+        Сборка из списка строк, строка - словарь {столбец: значение}
+        """
+        indptr = array('q', [0])
+        indices = array('q')
+        data = array('d')
+        for row in rows:
+            for j in sorted(row):
+                indices.append(j)
+                data.append(row[j])
+            indptr.append(len(indices))
+        return cls((len(rows), ncols), indptr, indices, data, labels)
+
+    @property
+    def nnz(self):
+        """Количество ненулевых элементов"""
+        return len(self.data)
+
+    def row(self, i):
+        """Пары (столбец, значение) ненулевых элементов строки i"""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return zip(self.indices[start:end], self.data[start:end])
+
+    def __getitem__(self, key):
+        """Элемент (i, j), двоичный поиск внутри строки"""
+        i, j = key
+        start, end = self.indptr[i], self.indptr[i + 1]
+        k = bisect_left(self.indices, j, start, end)
+        if k < end and self.indices[k] == j:
+            return self.data[k]
+        return 0
+
+    def to_dense(self):
+        """Плотная матрица списком списков"""
+        n, m = self.shape
+        dense = [[0] * m for _ in range(n)]
+        for i in range(n):
+            row = dense[i]
+            for j, value in self.row(i):
+                row[j] = value
+        return dense
+
+    def to_numpy(self):
+        """
+        Массивы (indptr, indices, data) как ndarray без копирования -
+        для векторных проходов по соседям
+        """
+        if np is None:
+            raise ImportError("Для to_numpy нужен NumPy")
+        return (np.frombuffer(self.indptr, dtype=np.int64),
+                np.frombuffer(self.indices, dtype=np.int64),
+                np.frombuffer(self.data, dtype=np.float64))
+
+
+class COOMatrix:
+    """
+    Разреженная матрица в формате COO (coordinate): тройки
+    (row[k], col[k], data[k]) для каждого ненулевого элемента.
+    labels - метки строк (вершин графа).
+    """
+    def __init__(self, shape, row, col, data, labels=None):
+        self.shape = shape
+        self.row = row    # array('q')
+        self.col = col    # array('q')
+        self.data = data  # array('d')
+        self.labels = labels
+
+    @property
+    def nnz(self):
+        """Количество ненулевых элементов"""
+        return len(self.data)
+
+    def entries(self):
+        """Тройки (строка, столбец, значение)"""
+        return zip(self.row, self.col, self.data)
+
+    def to_dense(self):
+        """Плотная матрица списком списков"""
+        n, m = self.shape
+        dense = [[0] * m for _ in range(n)]
+        for i, j, value in self.entries():
+            dense[i][j] = value
+        return dense
+
+    def to_numpy(self):
+        """Массивы (row, col, data) как ndarray без копирования"""
+        if np is None:
+            raise ImportError("Для to_numpy нужен NumPy")
+        return (np.frombuffer(self.row, dtype=np.int64),
+                np.frombuffer(self.col, dtype=np.int64),
+                np.frombuffer(self.data, dtype=np.float64))
+
+
+class _BlockWriter:
+    """
+    Буфер перед файловым объектом: текст копится и уходит в out одним
+    вызовом write, когда набирается EXPORT_BLOCK символов
+    """
+    def __init__(self, out, block=EXPORT_BLOCK):
+        self.out = out
+        self.block = block
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.block:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.out.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+
+
+def _window(window, size):
+    """
+    Окно строк или столбцов: None - все, slice или range - часть.
+    range, как и slice, обрезается по размеру матрицы: остаются
+    номера из [0, size)
+    """
+    if window is None:
+        return range(size)
+    if isinstance(window, slice):
+        return range(*window.indices(size))
+    if isinstance(window, range):
+        ascending = window if window.step > 0 else window[::-1]
+        inside = ascending[bisect_left(ascending, 0):bisect_left(ascending, size)]
+        return inside if window.step > 0 else inside[::-1]
+    raise TypeError("Окно задается через slice или range: %r" % (window,))
 
 
 class Graph:
-    def __init__(self, filename=None, directed=False):
+    def __init__(self, filename=None, directed=False, path_cache_bytes=PATH_CACHE_BYTES):
         """
         Инициализация графа.
         Если указан filename, загружает граф из файла.
         Параметр directed указывает, является ли граф ориентированным.
+        path_cache_bytes - бюджет памяти кэша результатов Дейкстры
+        (path_cache, см. PathCache); 0 отключает кэш.
+        Внутри вершины - плотные целые номера в порядке первого появления;
+        метки используются только на входе и выходе методов. Строки и
+        столбцы матриц на выходе, как и раньше, идут в порядке
+        sorted(vertices) - см. get_vertex_labels.
         """
         self.directed = directed
-        self.vertices = set()
-        self.edges = []
-        self.adjacency_list = defaultdict(list)
-        self.adjacency_matrix = None
-        self.incidence_matrix = None
+        # Интернирование вершин: номер -> метка и метка -> номер
+        self._labels = []
+        self._ids = {}
+        # Порядок вершин на выходе: (номера по возрастанию меток, место
+        # каждого номера в этом порядке), строится лениво
+        self._order = None
+        # Ребра по номеру ребра: номера концов и вес
+        self._edge_u = array('q')
+        self._edge_v = array('q')
+        self._edge_w = array('d')
+        # Смежность в плоских массивах: соседи вершины u лежат в
+        # _adj_target[_adj_start[u]:_adj_end[u]], их веса - в _adj_weight,
+        # номера ребер - в _adj_edge. После строки остается запас до
+        # _adj_start[u] + _adj_cap[u] для добавления ребер без перестройки
+        self._adj_start = array('q')
+        self._adj_end = array('q')
+        self._adj_cap = array('q')
+        self._adj_target = array('q')
+        self._adj_weight = array('d')
+        self._adj_edge = array('q')
+        # Полустепени захода (только для ориентированного графа);
+        # степень и полустепень исхода - длина строки смежности
+        self._in_degree = array('q')
+        # Матрицы строятся лениво при первом обращении
+        self._adjacency_matrix = None
+        self._incidence_matrix = None
+        self._adjacency_csr = None
+        self._incidence_coo = None
+        # Смежность по входящим ребрам ориентированного графа (те же шесть
+        # массивов, что и _adj_*), строится лениво
+        self._reverse_adjacency = None
+        # Связность: система множеств по ребрам (пополняется при добавлении
+        # ребер), номера компонент и компонент сильной связности - кэши
+        self._component_index = None
+        self._component_ids = None
+        self._scc_ids = None
+        # Ответ has_eulerian_cycle, сбрасывается вместе с компонентами
+        self._eulerian = None
+        # Отображение файла снимка (open_binary): пока граф не менялся,
+        # массивы - это memoryview на страницы файла
+        self._mapping = None
+        # Результаты Дейкстры от отдельных вершин, сбрасываются при изменении ребер
+        self.path_cache = PathCache(path_cache_bytes)
 
         if filename:
             self.load_from_file(filename)
 
-    def load_from_file(self, filename):
+    @property
+    def vertices(self):
+        """Множество меток вершин"""
+        return set(self._labels)
+
+    @property
+    def edges(self):
+        """Список ребер (u, v, weight) с метками вершин, собирается за O(m)"""
+        labels = self._labels
+        return [(labels[u], labels[v], weight)
+                for u, v, weight in zip(self._edge_u, self._edge_v, self._edge_w)]
+
+    @property
+    def adjacency_list(self):
+        """
+        Список смежности {метка: [(метка соседа, вес), ...]},
+        собирается из плоских массивов за O(n + m)
+        """
+        labels = self._labels
+        start, end = self._adj_start, self._adj_end
+        target, weight = self._adj_target, self._adj_weight
+        adjacency = defaultdict(list)
+        for u in range(len(labels)):
+            if start[u] != end[u]:
+                adjacency[labels[u]] = [(labels[target[k]], weight[k])
+                                        for k in range(start[u], end[u])]
+        return adjacency
+
+    def get_vertex_labels(self):
+        """
+        Метки вершин по возрастанию, как sorted(vertices) - в этом порядке
+        идут строки и столбцы матриц графа, результаты floyd_warshall,
+        bfs_levels и all_pairs_shortest_paths
+        """
+        labels = self._labels
+        return [labels[u] for u in self._vertex_order()[0]]
+
+    def _vertex_order(self):
+        """
+        Пара array('q') (order, position): номера вершин в порядке
+        get_vertex_labels и место каждого номера в этом порядке.
+        Несравнимые метки (например, числа вперемешку со строками)
+        остаются в порядке номеров. O(n log n), кэшируется до изменения
+        набора вершин; при построенных плотных матрицах обновляется
+        вместе с ними.
+        """
+        if self._order is None:
+            labels = self._labels
+            try:
+                order = array('q', sorted(range(len(labels)), key=labels.__getitem__))
+            except TypeError:
+                order = array('q', range(len(labels)))
+            self._order = (order, _inverse(order))
+        return self._order
+
+    def load_from_file(self, filename, chunk_size=CHUNK_SIZE, progress=None):
         """
         Загрузка графа из файла.
-        Формат файла:
+        Текстовый формат:
         Первая строка: количество вершин (опционально)
         Последующие строки: пары вершин (ребра), возможно с весом
+        Также читаются файлы, сжатые gzip, и двоичный формат ребер
+        (см. save_binary_edges) - формат определяется по первым байтам.
+        Файл читается блоками по chunk_size байт и разбирается пачками,
+        поэтому сверх самого графа нужна память только на один блок.
+        progress(прочитано_байт, размер_файла) вызывается после каждого блока.
         """
-        with open(filename, 'r') as f:
-            lines = f.readlines()
-
-            # Пропускаем пустые строки
-            lines = [line.strip() for line in lines if line.strip()]
-
-            # Читаем ребра
-            for line in lines:
-                parts = line.split()
-                if len(parts) >= 2:
-                    u = parts[0]
-                    v = parts[1]
-                    weight = float(parts[2]) if len(parts) > 2 else 1.0
-
-                    self.vertices.add(u)
-                    self.vertices.add(v)
-                    self.edges.append((u, v, weight))
-                    self.adjacency_list[u].append((v, weight))
+        total = os.path.getsize(filename)
+        self._detach_mapping()
+        with open(filename, 'rb') as raw:
+            stream = raw
+            if raw.read(len(GZIP_MAGIC)) == GZIP_MAGIC:
+                stream = gzip.GzipFile(fileobj=raw)
+            raw.seek(0)
+
+            head = stream.read(len(BINARY_EDGES_MAGIC))
+            if head == BINARY_EDGES_MAGIC:
+                batches = self._read_binary_edges(stream, chunk_size)
+            else:
+                batches = self._read_text_edges(stream, chunk_size, head)
 
-                    if not self.directed:
-                        self.adjacency_list[v].append((u, weight))
+            for batch in batches:
+                self._add_edges(batch)
+                if progress is not None:
+                    progress(raw.tell(), total)
 
-        # После загрузки ребер строим матричные представления
-        self._build_matrix_representations()
+        self._edges_changed()
 
-    def _build_matrix_representations(self):
-        """Строит матричные представления графа"""
-        vertices = sorted(self.vertices)
-        n = len(vertices)
-        m = len(self.edges)
+    def add_edge(self, u, v, weight=1.0):
+        """
+        Добавляет ребро u - v (u -> v в ориентированном графе).
+        Новые метки становятся новыми вершинами. Смежность, степени и
+        построенные плотные матрицы обновляются на месте: O(1) в среднем
+        (и O(n) на столбец матрицы инцидентности, если она построена;
+        новая вершина при построенных матрицах встает в них на свое
+        место в get_vertex_labels за O(n log n + n^2)).
+        """
+        self._detach_mapping()
+        i = self._add_vertex(u)
+        j = self._add_vertex(v)
+        e = len(self._edge_w)
+        self._edge_u.append(i)
+        self._edge_v.append(j)
+        self._edge_w.append(weight)
+
+        moved = _segment_append(self._forward(), i, j, weight, e)
+        if self.directed:
+            self._in_degree[j] += 1
+            if self._reverse_adjacency is not None:
+                _segment_append(self._reverse_adjacency, j, i, weight, e)
+        else:
+            moved = _segment_append(self._forward(), j, i, weight, e) or moved
+
+        if self._adjacency_matrix is not None or self._incidence_matrix is not None:
+            # Строки и столбцы плотных матриц - места вершин в get_vertex_labels
+            position = self._order[1]
+            p, q = position[i], position[j]
+            if self._adjacency_matrix is not None:
+                self._adjacency_matrix[p][q] = weight
+                if not self.directed:
+                    self._adjacency_matrix[q][p] = weight
+            if self._incidence_matrix is not None:
+                for row in self._incidence_matrix:
+                    row.append(0)
+                if i != j:
+                    self._incidence_matrix[p][e] = weight
+                self._incidence_matrix[q][e] = -weight if self.directed else weight
+
+        if self._component_index is not None:
+            self._component_index.union(i, j)
+        self._edges_mutated()
+        if moved:
+            self._compact_adjacency()
+
+    def add_vertex(self, label):
+        """Добавляет изолированную вершину (если ее еще нет)"""
+        self._detach_mapping()
+        self._add_vertex(label)
+        self._edges_mutated()
+
+    def remove_edge(self, u, v, weight=None):
+        """
+        Удаляет одно ребро u - v (с весом weight, если он задан) за
+        O(степени). KeyError, если такого ребра нет. Вершины остаются
+        в графе. Номер последнего ребра переходит к удаленному, поэтому
+        столбцы матрицы инцидентности меняют порядок.
+        """
+        self._detach_mapping()
+        self._remove_edge(self._find_edge(u, v, weight))
+        self._edges_mutated()
+
+    def set_edge_weight(self, u, v, weight):
+        """Меняет вес ребра u - v (первого из кратных). KeyError, если его нет"""
+        self._detach_mapping()
+        e = self._find_edge(u, v)
+        i, j = self._edge_u[e], self._edge_v[e]
+        self._edge_w[e] = weight
+        _segment_update(self._forward(), i, e, weight=weight)
+        if self.directed:
+            if self._reverse_adjacency is not None:
+                _segment_update(self._reverse_adjacency, j, e, weight=weight)
+        elif i != j:
+            _segment_update(self._forward(), j, e, weight=weight)
+
+        self._refresh_adjacency_cell(i, j)
+        if self._incidence_matrix is not None:
+            position = self._order[1]
+            if i != j:
+                self._incidence_matrix[position[i]][e] = weight
+            self._incidence_matrix[position[j]][e] = -weight if self.directed else weight
+        self._edges_mutated()
+
+    def remove_vertex(self, label):
+        """
+        Удаляет вершину и все ее ребра. KeyError, если вершины нет.
+        Время - O(d log d) на сортировку d дуг вершины, плюс степени ее
+        соседей и концов ребер, получающих освободившиеся номера, плюс
+        степени соседей последней вершины, которая переходит на номер
+        удаленной. В ориентированном графе первый вызов еще строит
+        обратную смежность за O(n + m); дальше она поддерживается.
+        Порядок get_vertex_labels у остальных вершин не меняется, из
+        построенных плотных матриц уходят строка и столбец удаленной
+        вершины.
+        """
+        self._detach_mapping()
+        x = self._ids[label]
+        rows = [self._forward()]
+        if self.directed:
+            rows.append(self._reverse_arrays(full=True))
+        # Ребра снимаются по убыванию номеров: дуга всегда последняя в
+        # строке x, а последнее ребро, получающее номер снятого, с x
+        # уже не связано и строки x не трогает
+        for adjacency in rows:
+            _segment_sort(adjacency, x)
+        while True:
+            e = -1
+            for start, end, _, _, _, edges in rows:
+                if end[x] > start[x]:
+                    e = max(e, edges[end[x] - 1])
+            if e < 0:
+                break
+            self._remove_edge(e)
+
+        last = len(self._labels) - 1
+        self._component_index = None
+        kept = p = None
+        if self._order is not None:
+            # Прежний порядок без x, уже в новых номерах
+            order, position = self._order
+            p = position[x]
+            kept = order[:p] + order[p + 1:]
+            if x != last:
+                kept[position[last] - (position[last] > p)] = x
+        if x != last:
+            self._move_vertex(last, x)
+        self._labels.pop()
+        del self._ids[label]
+        for values in (self._adj_start, self._adj_end, self._adj_cap):
+            values.pop()
+        if self.directed:
+            self._in_degree.pop()
+            if self._reverse_adjacency is not None:
+                for values in self._reverse_adjacency[:3]:
+                    values.pop()
+        if self._reorder_matrices(kept):
+            if self._adjacency_matrix is not None:
+                del self._adjacency_matrix[p]
+                for row in self._adjacency_matrix:
+                    del row[p]
+            if self._incidence_matrix is not None:
+                del self._incidence_matrix[p]
+        self._edges_mutated()
+
+    def degree(self, label):
+        """
+        Степень вершины (петля считается дважды); в ориентированном
+        графе - сумма полустепеней. O(1).
+        """
+        u = self._ids[label]
+        degree = self._adj_end[u] - self._adj_start[u]
+        if self.directed:
+            degree += self._in_degree[u]
+        return degree
+
+    def out_degree(self, label):
+        """Полустепень исхода (в неориентированном графе - степень). O(1)"""
+        u = self._ids[label]
+        return self._adj_end[u] - self._adj_start[u]
+
+    def in_degree(self, label):
+        """Полустепень захода (в неориентированном графе - степень). O(1)"""
+        if not self.directed:
+            return self.out_degree(label)
+        return self._in_degree[self._ids[label]]
+
+    def _forward(self):
+        """Шесть массивов смежности по исходящим ребрам"""
+        return (self._adj_start, self._adj_end, self._adj_cap,
+                self._adj_target, self._adj_weight, self._adj_edge)
+
+    def _add_vertex(self, label):
+        """Номер вершины label; новая вершина получает пустую строку смежности"""
+        i = self._ids.get(label)
+        if i is not None:
+            return i
+        i = self._ids[label] = len(self._labels)
+        self._labels.append(label)
+        adjacencies = [self._forward()]
+        if self.directed:
+            self._in_degree.append(0)
+            if self._reverse_adjacency is not None:
+                adjacencies.append(self._reverse_adjacency)
+        for start, end, cap, target, _, _ in adjacencies:
+            start.append(len(target))
+            end.append(len(target))
+            cap.append(0)
+        kept = None if self._order is None else self._order[0]
+        if self._reorder_matrices(kept):
+            p = self._order[1][i]
+            if self._adjacency_matrix is not None:
+                for row in self._adjacency_matrix:
+                    row.insert(p, 0)
+                self._adjacency_matrix.insert(p, [0] * (i + 1))
+            if self._incidence_matrix is not None:
+                self._incidence_matrix.insert(p, [0] * len(self._edge_w))
+        if self._component_index is not None:
+            self._component_index.add()
+        return i
+
+    def _find_edge(self, u, v, weight=None):
+        """Номер первого ребра u - v (с весом weight, если задан) за O(степени)"""
+        i = self._ids.get(u)
+        j = self._ids.get(v)
+        found = -1
+        if i is not None and j is not None:
+            target, weights, edges = self._adj_target, self._adj_weight, self._adj_edge
+            for k in range(self._adj_start[i], self._adj_end[i]):
+                if target[k] == j and (weight is None or weights[k] == weight) \
+                        and (found < 0 or edges[k] < found):
+                    found = edges[k]
+        if found < 0:
+            raise KeyError((u, v))
+        return found
+
+    def _remove_edge(self, e):
+        """
+        Удаляет ребро с номером e: его дуги убираются из строк смежности,
+        а последнее ребро получает номер e
+        """
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        forward, reverse = self._forward(), self._reverse_adjacency
+        # Удаление ребер не поддерживается системой множеств
+        self._component_index = None
+        i, j = edge_u[e], edge_v[e]
+        _segment_remove(forward, i, e)
+        if self.directed:
+            self._in_degree[j] -= 1
+            if reverse is not None:
+                _segment_remove(reverse, j, e)
+        else:
+            _segment_remove(forward, j, e)
 
-        # Матрица смежности
-        self.adjacency_matrix = [[0] * n for _ in range(n)]
-        vertex_index = {v: i for i, v in enumerate(vertices)}
+        last = len(edge_w) - 1
+        if e != last:
+            a, b = edge_u[last], edge_v[last]
+            edge_u[e], edge_v[e], edge_w[e] = a, b, edge_w[last]
+            _segment_update(forward, a, last, new_id=e)
+            if self.directed:
+                if reverse is not None:
+                    _segment_update(reverse, b, last, new_id=e)
+            elif a != b:
+                _segment_update(forward, b, last, new_id=e)
+        for values in (edge_u, edge_v, edge_w):
+            values.pop()
+
+        self._refresh_adjacency_cell(i, j)
+        if e != last:
+            # У ребер между a и b сменился порядок - вес в матрице мог стать другим
+            self._refresh_adjacency_cell(a, b)
+        if self._incidence_matrix is not None:
+            for row in self._incidence_matrix:
+                row[e] = row[last]
+                row.pop()
+
+    def _move_vertex(self, old, new):
+        """
+        Переносит изолированную вершину old на свободный номер new:
+        строки смежности переходят к new, ссылки на old в ребрах и
+        строках соседей исправляются за O(сумма степеней). Строки
+        плотных матриц идут по меткам и от номеров не зависят.
+        """
+        label = self._labels[old]
+        self._labels[new] = label
+        self._ids[label] = new
+        edge_u, edge_v = self._edge_u, self._edge_v
+        forward, reverse = self._forward(), self._reverse_adjacency
+        adjacencies = [forward] if reverse is None else [forward, reverse]
+        for start, end, cap, _, _, _ in adjacencies:
+            start[new], end[new], cap[new] = start[old], end[old], cap[old]
+        if self.directed:
+            self._in_degree[new] = self._in_degree[old]
+
+        # Дуги из строки old и парные им дуги в строках соседей
+        pairs = [(forward, forward if not self.directed else reverse)]
+        if self.directed:
+            pairs.append((reverse, forward))
+        for adjacency, twin in pairs:
+            if adjacency is None:
+                continue
+            start, end, _, target, _, edges = adjacency
+            for k in range(start[new], end[new]):
+                f = edges[k]
+                if edge_u[f] == old:
+                    edge_u[f] = new
+                if edge_v[f] == old:
+                    edge_v[f] = new
+                if target[k] == old:
+                    target[k] = new
+                elif twin is not None:
+                    _segment_update(twin, target[k], f, old_target=old, new_target=new)
+
+    def _refresh_adjacency_cell(self, i, j):
+        """
+        Пересчитывает клетку построенной плотной матрицы смежности:
+        вес последнего по номеру ребра i - j или 0, O(степени)
+        """
+        matrix = self._adjacency_matrix
+        if matrix is None:
+            return
+        target, weights, edges = self._adj_target, self._adj_weight, self._adj_edge
+        value, best = 0, -1
+        for k in range(self._adj_start[i], self._adj_end[i]):
+            if target[k] == j and edges[k] > best:
+                value, best = weights[k], edges[k]
+        position = self._order[1]
+        p, q = position[i], position[j]
+        matrix[p][q] = value
+        if not self.directed:
+            matrix[q][p] = value
 
-        for u, v, weight in self.edges:
-            i = vertex_index[u]
-            j = vertex_index[v]
-            self.adjacency_matrix[i][j] = weight
-            if not self.directed:
-                self.adjacency_matrix[j][i] = weight
+    def _reorder_matrices(self, kept):
+        """
+        Набор вершин изменился на одну вершину: новая получила последний
+        номер или удаленная ушла. kept - прежний порядок get_vertex_labels
+        без удаленной вершины, в новых номерах (None - порядок не
+        строился). Возвращает True, если построены плотные матрицы и
+        остальные вершины сохранили взаимный порядок: тогда вызывающий
+        вставляет или удаляет в матрицах одну строку и столбец. Иначе
+        построенные матрицы сбрасываются. O(n log n), если матрицы есть.
+        """
+        self._order = None
+        if self._adjacency_matrix is None and self._incidence_matrix is None:
+            return False
+        order, position = self._vertex_order()
+        if len(order) > len(kept or ()):
+            # Добавлена вершина с последним номером
+            p = position[len(order) - 1]
+            order = order[:p] + order[p + 1:]
+        if kept is not None and order == kept:
+            return True
+        self._adjacency_matrix = self._incidence_matrix = None
+        return False
 
-        # Матрица инцидентности
-        self.incidence_matrix = [[0] * m for _ in range(n)]
+    def _compact_adjacency(self):
+        """
+        После переносов строк в массивах смежности копится мусор;
+        когда его больше, чем живых дуг, смежность перестраивается за
+        O(n + m) - в среднем O(1) на изменение
+        """
+        arcs = len(self._edge_w) * (1 if self.directed else 2)
+        if len(self._adj_target) > 2 * arcs + 1024:
+            self._build_adjacency()
+            self._reverse_adjacency = None
 
-        for edge_idx, (u, v, weight) in enumerate(self.edges):
-            i = vertex_index[u]
-            j = vertex_index[v]
-            self.incidence_matrix[i][edge_idx] = weight
+    def _edges_mutated(self):
+        """
+        Сбрасывает то, что не обновляется по месту: разреженные
+        матрицы (строятся заново по запросу) и кэш путей
+        """
+        self._adjacency_csr = None
+        self._incidence_coo = None
+        self._component_ids = None
+        self._scc_ids = None
+        self._eulerian = None
+        self.path_cache.clear()
+
+    def _edges_changed(self):
+        """Перестраивает смежность после изменения ребер"""
+        self._build_adjacency()
+        # Ребра изменились - построенные ранее матрицы и пути устарели
+        self._invalidate_matrices()
+
+    def save_binary(self, path):
+        """
+        Сохранение графа в двоичный снимок для open_binary.
+        Формат: заголовок SNAPSHOT_HEADER, метки вершин в UTF-8 через
+        перевод строки (дополнены нулями до 8 байт), затем массивы
+        little-endian по 8 байт: концы и веса ребер, смежность в CSR -
+        смещения строк (n + 1), соседи, веса и номера ребер дуг,
+        и для ориентированного графа - полустепени захода.
+        Метки должны быть строками без перевода строки.
+        """
+        for label in self._labels:
+            if not isinstance(label, str):
+                raise TypeError("В снимке метки вершин должны быть строками: %r" % (label,))
+            if '\n' in label:
+                raise ValueError("Метка вершины содержит перевод строки: %r" % (label,))
+        blob = '\n'.join(self._labels).encode()
+        if sys.byteorder != 'little':
+            raise ValueError("Снимок графа поддерживается только на little-endian")
+
+        # Строки смежности подряд, без запаса после каждой строки
+        start, end = self._adj_start, self._adj_end
+        offsets = array('q', [0])
+        target, weight, edge = array('q'), array('d'), array('q')
+        # Массивы графа из open_binary - memoryview, поэтому строки
+        # переносятся байтами, а не сложением array
+        sources = (memoryview(self._adj_target).cast('B'),
+                   memoryview(self._adj_weight).cast('B'),
+                   memoryview(self._adj_edge).cast('B'))
+        for u in range(len(self._labels)):
+            first, last = 8 * start[u], 8 * end[u]
+            for values, source in zip((target, weight, edge), sources):
+                values.frombytes(source[first:last])
+            offsets.append(len(target))
+
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.directed, len(self._labels),
+                                         len(self._edge_w), len(target), len(blob)))
+            f.write(blob)
+            f.write(bytes(-len(blob) % 8))
+            for part in (self._edge_u, self._edge_v, self._edge_w,
+                         offsets, target, weight, edge):
+                f.write(memoryview(part).cast('B'))
             if self.directed:
-                self.incidence_matrix[j][edge_idx] = -weight
-            else:
-                self.incidence_matrix[j][edge_idx] = weight
+                f.write(memoryview(self._in_degree).cast('B'))
 
-    def get_adjacency_matrix(self):
-        """Возвращает матрицу смежности"""
-        if not self.incidence_matrix:
-            print("Матрица инцидентности не построена")
+    @classmethod
+    def open_binary(cls, path, path_cache_bytes=PATH_CACHE_BYTES):
+        """
+        Открытие снимка save_binary без разбора: файл отображается в
+        память только для чтения, массивы ребер и смежности - memoryview
+        на его страницы, поэтому открытие почти не зависит от числа
+        ребер, а процессы, открывшие один файл, делят одни страницы.
+        Копируются только метки вершин. При первом изменении графа
+        массивы копируются в обычные array.
+        close() (или выход из with) освобождает отображение; после
+        этого граф пуст.
+        """
+        if sys.byteorder != 'little':
+            raise ValueError("Снимок графа поддерживается только на little-endian")
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        problem = None
+        if len(view) < SNAPSHOT_HEADER.size:
+            problem = "Файл слишком короткий для снимка графа"
+        else:
+            magic, directed, n, m, arcs, blob = SNAPSHOT_HEADER.unpack_from(view)
+            offset = SNAPSHOT_HEADER.size + blob + (-blob % 8)
+            if magic != SNAPSHOT_MAGIC:
+                problem = "Файл не является снимком графа"
+            elif len(view) < offset + 8 * (3 * m + n + 1 + 3 * arcs + (n if directed else 0)):
+                problem = "Снимок графа обрезан"
+        if problem is not None:
+            view.release()
+            mapping.close()
+            raise ValueError(problem)
+
+        def section(typecode, count):
+            nonlocal offset
+            part = view[offset:offset + 8 * count].cast(typecode)
+            offset += 8 * count
+            return part
+
+        graph = cls(directed=directed, path_cache_bytes=path_cache_bytes)
+        labels = bytes(view[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + blob]).decode()
+        graph._labels = labels.split('\n') if n else []
+        graph._ids = dict(zip(graph._labels, range(n)))
+        graph._edge_u = section('q', m)
+        graph._edge_v = section('q', m)
+        graph._edge_w = section('d', m)
+        offsets = section('q', n + 1)
+        graph._adj_start = offsets[:n]
+        graph._adj_end = offsets[1:]
+        graph._adj_cap = None  # Нужна только для изменений, см. _detach_mapping
+        graph._adj_target = section('q', arcs)
+        graph._adj_weight = section('d', arcs)
+        graph._adj_edge = section('q', arcs)
+        graph._in_degree = section('q', n) if directed else array('q')
+        view.release()
+        graph._mapping = mapping
+        return graph
+
+    # Массивы графа, которые open_binary отображает на файл снимка
+    MAPPED_ARRAYS = (('_edge_u', 'q'), ('_edge_v', 'q'), ('_edge_w', 'd'),
+                     ('_adj_start', 'q'), ('_adj_end', 'q'),
+                     ('_adj_target', 'q'), ('_adj_weight', 'd'),
+                     ('_adj_edge', 'q'), ('_in_degree', 'q'))
+
+    def close(self):
+        """
+        Освобождение отображения файла графа из open_binary.
+        Данные графа живут в отображении, поэтому после close граф
+        становится пустым. Для графа не из снимка ничего не делает.
+        """
+        if self._mapping is None:
+            return
+        self._labels = []
+        self._ids = {}
+        views = []
+        for name, typecode in self.MAPPED_ARRAYS:
+            views.append(getattr(self, name))
+            setattr(self, name, array(typecode))
+        self._adj_cap = array('q')
+        self._invalidate_matrices()
+        self._release_mapping(views)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _release_mapping(self, views=()):
+        """Закрывает отображение, отпустив ссылавшиеся на него memoryview"""
+        for view in views:
+            if isinstance(view, memoryview):
+                view.release()
+        self._mapping.close()
+        self._mapping = None
+
+    def _detach_mapping(self):
+        """
+        Перед изменением графа, открытого open_binary: массивы из файла
+        копируются в обычные array, отображение файла больше не нужно
+        """
+        if self._mapping is None:
+            return
+        views = []
+        for name, typecode in self.MAPPED_ARRAYS:
+            view = getattr(self, name)
+            values = array(typecode)
+            values.frombytes(memoryview(view).cast('B'))
+            setattr(self, name, values)
+            views.append(view)
+        self._adj_cap = array('q', (e - s for s, e in zip(self._adj_start, self._adj_end)))
+        self._reverse_adjacency = None
+        self._adjacency_csr = None
+        self._incidence_coo = None
+        self._release_mapping(views)
+
+    @staticmethod
+    def _read_text_edges(stream, chunk_size, pending=b''):
+        """
+        Разбор текстового списка ребер блоками.
+        Неполная последняя строка блока переносится в следующий блок.
+        Выдает списки ребер (u, v, weight).
+        """
+        while True:
+            chunk = stream.read(chunk_size)
+            data = pending + chunk
+            if chunk:
+                cut = data.rfind(b'\n') + 1
+                data, pending = data[:cut], data[cut:]
+            batch = []
+            for line in data.decode().splitlines():
+                parts = line.split()
+                if len(parts) >= 2:
+                    weight = float(parts[2]) if len(parts) > 2 else 1.0
+                    batch.append((parts[0], parts[1], weight))
+            if batch:
+                yield batch
+            if not chunk:
+                return
+
+    @staticmethod
+    def _read_binary_edges(stream, chunk_size):
+        """
+        Разбор двоичного списка ребер: записи BINARY_EDGE (u, v, weight).
+        Метки вершин - целые числа, в графе они хранятся строками,
+        как и при чтении текстового файла.
+        """
+        size = BINARY_EDGE.size
+        chunk_size = max(chunk_size // size, 1) * size
+        pending = b''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            data = pending + chunk
+            cut = len(data) - len(data) % size
+            data, pending = data[:cut], data[cut:]
+            yield [(str(u), str(v), w) for u, v, w in BINARY_EDGE.iter_unpack(data)]
+        if pending:
+            raise ValueError("Двоичный файл ребер обрезан")
+
+    def _add_edges(self, batch):
+        """Добавляет пачку ребер, назначая новым меткам номера вершин"""
+        ids, labels = self._ids, self._labels
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        for u, v, weight in batch:
+            i = ids.get(u)
+            if i is None:
+                i = ids[u] = len(labels)
+                labels.append(u)
+            j = ids.get(v)
+            if j is None:
+                j = ids[v] = len(labels)
+                labels.append(v)
+            edge_u.append(i)
+            edge_v.append(j)
+            edge_w.append(weight)
+
+    def _build_adjacency(self):
+        """
+        Строит плоские массивы смежности из массивов ребер сортировкой
+        подсчетом за O(n + m). Соседи каждой вершины идут в порядке
+        добавления ребер; в неориентированном графе ребро попадает
+        в строки обоих концов. Строки строятся без запаса: емкость
+        равна степени. Заодно считаются полустепени захода.
+        """
+        n = len(self._labels)
+        if np is not None:
+            self._build_adjacency_numpy(n)
             return
 
-        vertices = sorted(self.vertices)
-        edges = self.edges
-        n = len(vertices)
-        m = len(edges)
-
-        print("\nМатрица инцидентности (по столбцам):")
-        print("   " + " ".join(f"{i + 1:>5}" for i in range(m)))
-
-        # Транспонируем матрицу для вывода по столбцам
-        transposed = [[self.incidence_matrix[j][i] for j in range(n)] for i in range(m)]
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        degree = [0] * n
+        for u in edge_u:
+            degree[u] += 1
+        in_degree = [0] * n
+        for v in edge_v:
+            in_degree[v] += 1
+        if not self.directed:
+            for v in range(n):
+                degree[v] += in_degree[v]
+
+        start = array('q', bytes(8 * n))
+        offset = 0
+        for u in range(n):
+            start[u] = offset
+            offset += degree[u]
+
+        target = array('q', bytes(8 * offset))
+        weight = array('d', bytes(8 * offset))
+        edge = array('q', bytes(8 * offset))
+        pos = list(start)
+        for e, (u, v, w) in enumerate(zip(edge_u, edge_v, edge_w)):
+            k = pos[u]
+            target[k] = v
+            weight[k] = w
+            edge[k] = e
+            pos[u] = k + 1
+            if not self.directed:
+                k = pos[v]
+                target[k] = u
+                weight[k] = w
+                edge[k] = e
+                pos[v] = k + 1
+
+        self._adj_start = start
+        self._adj_end = array('q', pos)
+        self._adj_cap = array('q', degree)
+        self._adj_target = target
+        self._adj_weight = weight
+        self._adj_edge = edge
+        self._in_degree = array('q', in_degree if self.directed else ())
+
+    def _build_adjacency_numpy(self, n):
+        """То же, что _build_adjacency, устойчивой сортировкой NumPy"""
+        u = np.frombuffer(self._edge_u, dtype=np.int64)
+        v = np.frombuffer(self._edge_v, dtype=np.int64)
+        w = np.frombuffer(self._edge_w, dtype=np.float64)
+        if self.directed:
+            src, dst, wt = u, v, w
+        else:
+            # Прямая и обратная запись ребра идут подряд
+            src = np.empty(2 * len(u), dtype=np.int64)
+            dst = np.empty(2 * len(u), dtype=np.int64)
+            src[0::2], src[1::2] = u, v
+            dst[0::2], dst[1::2] = v, u
+            wt = np.repeat(w, 2)
+        order = np.argsort(src, kind='stable')
+        degree = np.bincount(src, minlength=n)
+        end = np.cumsum(degree)
+
+        self._adj_start = _to_array('q', end - degree)
+        self._adj_end = _to_array('q', end)
+        self._adj_cap = _to_array('q', degree)
+        self._adj_target = _to_array('q', dst[order])
+        self._adj_weight = _to_array('d', wt[order])
+        self._adj_edge = _to_array('q', order if self.directed else order // 2)
+        self._in_degree = _to_array('q', np.bincount(v, minlength=n)
+                                    if self.directed else ())
+
+    @property
+    def adjacency_matrix(self):
+        """
+        Плотная матрица смежности n x n (вершины в порядке get_vertex_labels).
+        Строится из разреженной при первом обращении и затем
+        обновляется методами изменения графа.
+        """
+        if self._adjacency_matrix is None:
+            self._adjacency_matrix = self.adjacency_csr().to_dense()
+        return self._adjacency_matrix
 
-        for i in range(n):
-            print(f"{vertices[i]:>3}", end=" ")
-            for j in range(m):
-                print(f"{transposed[j][i]:>5}", end=" ")
-            print()
-        return print("_________________________________")
-
-    def get_incidence_matrix(self):
-        """Возвращает матрицу инцидентности"""
-        if not self.incidence_matrix:
-            print("Матрица инцидентности не построена")
+    @property
+    def incidence_matrix(self):
+        """
+        Плотная матрица инцидентности n x m.
+        Строится из разреженной при первом обращении и затем
+        обновляется методами изменения графа.
+        """
+        if self._incidence_matrix is None:
+            self._incidence_matrix = self.incidence_coo().to_dense()
+        return self._incidence_matrix
+
+    def _invalidate_matrices(self):
+        """Сбрасывает построенные матрицы после изменения ребер"""
+        self._adjacency_matrix = None
+        self._incidence_matrix = None
+        self._adjacency_csr = None
+        self._incidence_coo = None
+        self._reverse_adjacency = None
+        self._component_index = None
+        self._component_ids = None
+        self._scc_ids = None
+        self._eulerian = None
+        self._order = None
+        self.path_cache.clear()
+
+    def adjacency_csr(self):
+        """
+        Матрица смежности в формате CSR: O(n + m) памяти.
+        Порядок вершин тот же, что у adjacency_matrix; при кратных ребрах,
+        как и в плотной матрице, остается вес последнего ребра.
+        """
+        if self._adjacency_csr is None:
+            self._adjacency_csr = self._build_adjacency_csr()
+        return self._adjacency_csr
+
+    def incidence_coo(self):
+        """Матрица инцидентности в формате COO: O(n + m) памяти"""
+        if self._incidence_coo is None:
+            self._incidence_coo = self._build_incidence_coo()
+        return self._incidence_coo
+
+    def _build_adjacency_csr(self):
+        """Строит разреженную матрицу смежности"""
+        position = self._vertex_order()[1]
+        rows = [{} for _ in self._labels]
+        for u, v, weight in zip(self._edge_u, self._edge_v, self._edge_w):
+            p, q = position[u], position[v]
+            rows[p][q] = weight
+            if not self.directed:
+                rows[q][p] = weight
+        return CSRMatrix.from_rows(rows, len(rows), self.get_vertex_labels())
+
+    def _build_incidence_coo(self):
+        """Строит разреженную матрицу инцидентности"""
+        position = self._vertex_order()[1]
+        row = array('q')
+        col = array('q')
+        data = array('d')
+
+        for edge_idx, (i, j, weight) in enumerate(
+                zip(self._edge_u, self._edge_v, self._edge_w)):
+            head = -weight if self.directed else weight
+            if i != j:
+                row.append(position[i])
+                col.append(edge_idx)
+                data.append(weight)
+            # Для петли в столбце одна запись - значение для конца ребра
+            row.append(position[j])
+            col.append(edge_idx)
+            data.append(head)
+        shape = (len(self._labels), len(self._edge_w))
+        return COOMatrix(shape, row, col, data, self.get_vertex_labels())
+
+    def get_adjacency_matrix(self, sparse=False, out=None):
+        """
+        Возвращает матрицу смежности.
+        При sparse=True возвращает CSRMatrix без печати.
+        """
+        if sparse:
+            return self.adjacency_csr()
+        if not self._labels:
+            print("Матрица инцидентности не построена", file=out)
             return
 
-        vertices = sorted(self.vertices)
-        edges = self.edges
-        n = len(vertices)
-        m = len(edges)
+        out = sys.stdout if out is None else out
+        out.write("\nМатрица инцидентности (по столбцам):\n")
+        self.export_matrix(out, kind="incidence")
+        return print("_________________________________", file=out)
 
-        print("   " + " ".join(f"{i + 1:>5}" for i in range(m)))
+    def get_incidence_matrix(self, sparse=False, out=None):
+        """
+        Возвращает матрицу инцидентности.
+        При sparse=True возвращает COOMatrix без печати.
+        """
+        if sparse:
+            return self.incidence_coo()
+        if not self._labels:
+            print("Матрица инцидентности не построена", file=out)
+            return
 
-        # Транспонируем матрицу для вывода по столбцам
-        transposed = [[self.incidence_matrix[j][i] for j in range(n)] for i in range(m)]
+        self.export_matrix(out, kind="incidence")
 
-        for i in range(n):
-            print(f"{vertices[i]:>3}", end=" ")
-            for j in range(m):
-                print(f"{transposed[j][i]:>5}", end=" ")
-            print()
+    def export_matrix(self, out=None, kind="adjacency", format="text",
+                      rows=None, cols=None):
+        """
+        Потоковый вывод матрицы смежности (kind="adjacency") или
+        инцидентности (kind="incidence") в файловый объект out
+        (по умолчанию sys.stdout). Каждая строка собирается прямо из
+        массивов смежности за O(степени + ширины окна) - без плотной
+        матрицы и транспонирования, - а текст пишется блоками по
+        EXPORT_BLOCK символов.
+        format: "text" - выровненная таблица, как в get_incidence_matrix;
+        "csv" - заголовок из меток или номеров столбцов, первый столбец -
+        метки вершин; "mtx" - Matrix Market (coordinate real general),
+        только ненулевые элементы.
+        rows, cols - окна (slice или range) номеров строк и столбцов
+        (строки и столбцы смежности - в порядке get_vertex_labels),
+        чтобы выводить огромную матрицу по частям.
+        """
+        if kind not in ("adjacency", "incidence"):
+            raise ValueError("Неизвестная матрица: %r" % (kind,))
+        if format not in EXPORT_FORMATS:
+            raise ValueError("Неизвестный формат: %r" % (format,))
+        self._export(sys.stdout if out is None else out, kind, format, rows, cols)
+
+    def _export(self, out, kind, format, rows, cols, column_prefix=''):
+        """Вывод для export_matrix; column_prefix - приставка номеров столбцов"""
+        labels = self.get_vertex_labels()
+        ncols = len(labels) if kind == "adjacency" else len(self._edge_w)
+        rows = _window(rows, len(labels))
+        cols = _window(cols, ncols)
+        row_values = self._adjacency_row if kind == "adjacency" else self._incidence_row
+        if kind == "adjacency":
+            names = [labels[j] for j in cols]
+        else:
+            names = [j + 1 for j in cols]
+        writer = _BlockWriter(out)
+
+        if format == "text":
+            writer.write("   " + " ".join(f"{column_prefix}{name:>5}" for name in names) + "\n")
+            # Строки почти целиком из нулей: готовая клетка нуля размножается,
+            # форматируются только ненулевые элементы
+            zero = f"{0:>5} "
+            for i in rows:
+                cells = [zero] * len(cols)
+                for j, value in row_values(i).items():
+                    if j in cols:
+                        cells[(j - cols.start) // cols.step] = f"{value:>5} "
+                writer.write(f"{labels[i]:>3} " + "".join(cells) + "\n")
+        elif format == "csv":
+            table = csv.writer(writer, lineterminator="\n")
+            table.writerow([""] + [f"{column_prefix}{name}" for name in names])
+            for i in rows:
+                cells = [0] * len(cols)
+                for j, value in row_values(i).items():
+                    if j in cols:
+                        cells[(j - cols.start) // cols.step] = value
+                table.writerow([labels[i]] + cells)
+        else:
+            # Размер заголовка Matrix Market требует числа ненулевых заранее
+            nnz = sum(sum(1 for j in row_values(i) if j in cols) for i in rows)
+            writer.write("%%MatrixMarket matrix coordinate real general\n")
+            writer.write("%% %s matrix, rows %s, columns %s\n" % (kind, rows, cols))
+            writer.write("%d %d %d\n" % (len(rows), len(cols), nnz))
+            for r, i in enumerate(rows, 1):
+                values = row_values(i)
+                for j in sorted(values):
+                    if j in cols:
+                        c = (j - cols.start) // cols.step + 1
+                        writer.write("%d %d %r\n" % (r, c, float(values[j])))
+        writer.flush()
+
+    def _adjacency_row(self, i):
+        """
+        Строка i матрицы смежности {столбец: вес} по массивам смежности;
+        при кратных ребрах, как в adjacency_csr, - вес последнего ребра
+        """
+        order, position = self._vertex_order()
+        u = order[i]
+        target, weights, edges = self._adj_target, self._adj_weight, self._adj_edge
+        row, last = {}, {}
+        for k in range(self._adj_start[u], self._adj_end[u]):
+            v = position[target[k]]
+            if edges[k] >= last.get(v, -1):
+                row[v] = weights[k]
+                last[v] = edges[k]
+        return row
+
+    def _incidence_row(self, i):
+        """
+        Строка i матрицы инцидентности {номер ребра: значение}, как в
+        incidence_coo: вес для начала ребра, для конца ориентированного
+        ребра - минус вес (у ориентированной петли - только он)
+        """
+        u = self._vertex_order()[0][i]
+        row = {}
+        weights, edges = self._adj_weight, self._adj_edge
+        for k in range(self._adj_start[u], self._adj_end[u]):
+            row[edges[k]] = weights[k]
+        if self.directed:
+            start, end, _, _, weights, edges = self._reverse_arrays(full=True)
+            for k in range(start[u], end[u]):
+                row[edges[k]] = -weights[k]
+        return row
 
     def get_edge_list(self):
         """Возвращает список ребер"""
@@ -137,261 +1669,1052 @@ class Graph:
     def kruskal_mst(self):
         """
         Алгоритм Краскала для поиска минимального остовного дерева.
-        Возвращает список ребер MST.
+        Возвращает список ребер MST (для несвязного графа - остовного леса).
         """
-        parent = {}
-        rank = {}
-
-        def find(u):
-            while parent[u] != u:
-                parent[u] = parent[parent[u]]
-                u = parent[u]
-            return u
+        return self.minimum_spanning_tree("kruskal", forest=True)
 
-        def union(u, v):
-            root_u = find(u)
-            root_v = find(v)
-
-            if root_u == root_v:
-                return False
-
-            if rank[root_u] > rank[root_v]:
-                parent[root_v] = root_u
-            elif rank[root_u] < rank[root_v]:
-                parent[root_u] = root_v
-            else:
-                parent[root_v] = root_u
-                rank[root_u] += 1
-            return True
+    def minimum_spanning_tree(self, engine="kruskal", forest=False, workers=1):
+        """
+        Минимальное остовное дерево: список ребер (u, v, weight).
+        engine: "kruskal" - сортировка ребер по весу и система
+        непересекающихся множеств; "prim" - Прим с кучей, лучше для
+        плотных графов; "boruvka" - Борувка, поиск самых легких ребер
+        компонент делится между workers процессами (None - по числу ядер;
+        по умолчанию и при m < PARALLEL_EDGES - в текущем процессе).
+        Направление ребер ориентированного графа не учитывается.
+        Для несвязного графа при forest=True возвращается минимальный
+        остовный лес, иначе - ValueError.
+        """
+        engines = {"kruskal": self._kruskal, "prim": self._prim,
+                   "boruvka": lambda: self._boruvka(workers)}
+        if engine not in engines:
+            raise ValueError("Неизвестный алгоритм: %r" % (engine,))
+        labels = self._labels
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        tree = engines[engine]()
+        if not forest and len(tree) < len(labels) - 1:
+            raise ValueError("Граф несвязный: остовного дерева нет")
+        return [(labels[edge_u[e]], labels[edge_v[e]], edge_w[e]) for e in tree]
+
+    def _kruskal(self):
+        """Краскал: номера ребер остовного леса в порядке добавления"""
+        n = len(self._labels)
+        union = DisjointSet(n).union
+
+        # Сортируем номера ребер по весу (устойчиво)
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        if np is not None:
+            order = np.argsort(np.frombuffer(edge_w, dtype=np.float64),
+                               kind='stable').tolist()
+        else:
+            order = sorted(range(len(edge_w)), key=edge_w.__getitem__)
+        tree = []
 
-        # Инициализация
-        for v in self.vertices:
-            parent[v] = v
-            rank[v] = 0
+        for e in order:
+            if union(edge_u[e], edge_v[e]):
+                tree.append(e)
+                if len(tree) == n - 1:
+                    break
 
-        # Сортируем ребра по весу
-        sorted_edges = sorted(self.edges, key=lambda x: x[2])
-        mst = []
+        return tree
 
-        for u, v, weight in sorted_edges:
-            if union(u, v):
-                mst.append((u, v, weight))
-                if len(mst) == len(self.vertices) - 1:
+    def _prim(self):
+        """
+        Прим с ленивой кучей по плоским массивам смежности (в
+        ориентированном графе - по исходящим и входящим ребрам);
+        из каждой еще не достигнутой вершины растет новое дерево леса
+        """
+        n = len(self._labels)
+        adjacencies = [self._forward()]
+        if self.directed:
+            adjacencies.append(self._reverse_arrays(full=True))
+        in_tree = bytearray(n)
+        tree = []
+
+        for root in range(n):
+            if in_tree[root]:
+                continue
+            heap = [(0, -1, root)]
+            while heap:
+                _, e, u = heapq.heappop(heap)
+                if in_tree[u]:
+                    continue
+                in_tree[u] = 1
+                if e >= 0:
+                    tree.append(e)
+                for start, end, _, target, weights, edges in adjacencies:
+                    for k in range(start[u], end[u]):
+                        v = target[k]
+                        if not in_tree[v]:
+                            heapq.heappush(heap, (weights[k], edges[k], v))
+
+        return tree
+
+    def _boruvka(self, workers=1):
+        """
+        Борувка: за раунд каждая компонента берет самое легкое выходящее
+        ребро, компонент становится хотя бы вдвое меньше. При workers > 1
+        и m >= PARALLEL_EDGES ребра делятся на диапазоны между процессами; ребра и номера
+        компонент лежат в разделяемой памяти, в задачах - только границы.
+        """
+        n = len(self._labels)
+        m = len(self._edge_w)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        sets = DisjointSet(n)
+        tree = []
+        if m == 0:
+            return tree
+
+        shm = pool = None
+        edge_u, edge_v, edge_w = self._edge_u, self._edge_v, self._edge_w
+        component = array('q', range(n))
+        try:
+            if workers > 1 and m >= PARALLEL_EDGES:
+                shm = SharedMemory(create=True, size=24 * m + 8 * max(n, 1))
+                offset = 0
+                for part in (edge_u, edge_v, edge_w):
+                    shm.buf[offset:offset + 8 * m] = memoryview(part).cast('B')
+                    offset += 8 * m
+                shared_component = shm.buf[offset:offset + 8 * n].cast('q')
+                pool = ProcessPoolExecutor(workers, initializer=_attach_shared_edges,
+                                           initargs=(shm.name, m, n))
+                step = -(-m // workers)
+
+            while True:
+                if pool is None:
+                    parts = [_cheapest_edges(0, m, edge_u, edge_v, edge_w, component)]
+                else:
+                    shared_component[:] = component
+                    parts = list(pool.map(_cheapest_edges_shared,
+                                          range(0, m, step),
+                                          [min(first + step, m) for first in range(0, m, step)]))
+                best = parts[0]
+                for part in parts[1:]:
+                    for c, key in part.items():
+                        if c not in best or key < best[c]:
+                            best[c] = key
+
+                added = False
+                for _, e in best.values():
+                    if sets.union(edge_u[e], edge_v[e]):
+                        tree.append(e)
+                        added = True
+                if not added:
                     break
-
-        return mst
+                for v in range(n):
+                    component[v] = sets.find(v)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if shm is not None:
+                del shared_component
+                shm.close()
+                shm.unlink()
+
+        return tree
 
     def has_eulerian_cycle(self):
         """
         Проверяет, содержит ли граф Эйлеров цикл.
         Для неориентированного графа:
         - все вершины должны иметь четную степень
-        - граф должен быть связным
+        - вершины с ребрами должны лежать в одной компоненте связности
         Для ориентированного графа:
         - для всех вершин in_degree == out_degree
-        - граф должен быть сильно связным
+        - вершины с ребрами должны лежать в одной компоненте слабой
+          связности (при равных полустепенях это равносильно сильной)
+        Первая проверка - O(n + m), ответ кэшируется до изменения ребер:
+        повторная проверка - O(1).
         """
-        if not self.directed:
-            # Проверяем степени вершин
-            degrees = defaultdict(int)
-            for u in self.adjacency_list:
-                degrees[u] += len(self.adjacency_list[u])
-                for v, _ in self.adjacency_list[u]:
-                    degrees[v] += 1
-
-            for v in self.vertices:
-                if degrees[v] % 2 != 0:
-                    return False
+        if self._eulerian is None:
+            self._eulerian = (self._euler_start(circuit=True) is not None
+                              and self._edges_connected())
+        return self._eulerian
 
-            # Проверяем связность (упрощенная проверка)
-            if not self._is_connected():
-                return False
-        else:
-            # Для ориентированного графа
-            in_degree = defaultdict(int)
-            out_degree = defaultdict(int)
+    def eulerian_circuit(self, start=None):
+        """
+        Эйлеров цикл: список меток вершин обхода, проходящего по каждому
+        ребру ровно один раз (первая метка совпадает с последней), или
+        None, если цикла нет. start - вершина начала (по умолчанию -
+        первая вершина с ребрами), KeyError, если ее нет в графе.
+        Итеративный алгоритм Хирхольцера по номерам ребер, O(n + m)
+        без рекурсии.
+        """
+        first = None if start is None else self._ids[start]
+        v = self._euler_start(circuit=True)
+        if v is None:
+            return None
+        if first is not None:
+            v = first
+            if self._adj_end[v] == self._adj_start[v]:
+                return [start] if not len(self._edge_w) else None
+        return self._hierholzer(v)
+
+    def eulerian_path(self):
+        """
+        Эйлеров путь: список меток вершин обхода, проходящего по каждому
+        ребру ровно один раз, или None, если пути нет. Если есть Эйлеров
+        цикл, возвращается он. Как и eulerian_circuit, O(n + m).
+        """
+        v = self._euler_start(circuit=False)
+        if v is None:
+            return None
+        return self._hierholzer(v)
 
-            for u in self.adjacency_list:
-                out_degree[u] += len(self.adjacency_list[u])
-                for v, _ in self.adjacency_list[u]:
-                    in_degree[v] += 1
+    def _euler_start(self, circuit):
+        """
+        Проверка степеней для Эйлерова цикла (circuit=True) или пути.
+        Возвращает номер вершины, с которой надо начинать обход,
+        -1 для графа без ребер или None, если условие на степени нарушено.
+        """
+        start, end = self._adj_start, self._adj_end
+        first = -1   # Первая вершина с ребрами
+        source = -1  # Вершина, из которой путь обязан начинаться
+        odd = 0
+        if not self.directed:
+            for v in range(len(self._labels)):
+                # Степень - длина строки смежности, петля дает в ней две дуги
+                degree = end[v] - start[v]
+                if degree and first < 0:
+                    first = v
+                if degree % 2:
+                    odd += 1
+                    if source < 0:
+                        source = v
+            if odd > (0 if circuit else 2):
+                return None
+        else:
+            in_degree = self._in_degree
+            sink = 0
+            for v in range(len(self._labels)):
+                balance = end[v] - start[v] - in_degree[v]
+                if first < 0 and end[v] != start[v]:
+                    first = v
+                if balance == 0:
+                    continue
+                if circuit or balance not in (1, -1):
+                    return None
+                if balance == 1:
+                    odd += 1
+                    source = v
+                else:
+                    sink += 1
+            if odd > 1 or sink != odd:
+                return None
+        return source if source >= 0 else first
+
+    def _hierholzer(self, v):
+        """
+        Алгоритм Хирхольцера из вершины с номером v: обход идет по
+        неиспользованным ребрам, пока не упрется, а вершины тупиков
+        складываются в ответ. Ребра отмечаются по номерам, поэтому
+        обе дуги неориентированного ребра тратятся сразу. None, если
+        пройдены не все ребра (граф несвязный).
+        """
+        labels = self._labels
+        m = len(self._edge_w)
+        if v < 0:
+            return []
+        start, end = self._adj_start, self._adj_end
+        target, edges = self._adj_target, self._adj_edge
+        used = bytearray(m)
+        arc = array('q', start)  # Следующая непросмотренная дуга вершины
+        stack = [v]
+        path = []
 
-            for v in self.vertices:
-                if in_degree[v] != out_degree[v]:
+        while stack:
+            v = stack[-1]
+            k = arc[v]
+            stop = end[v]
+            while k < stop and used[edges[k]]:
+                k += 1
+            if k < stop:
+                arc[v] = k + 1
+                used[edges[k]] = 1
+                stack.append(target[k])
+            else:
+                arc[v] = k
+                path.append(stack.pop())
+
+        if len(path) != m + 1:
+            return None
+        path.reverse()
+        return [labels[u] for u in path]
+
+    def _edges_connected(self):
+        """Все вершины с ребрами лежат в одной компоненте (слабой) связности"""
+        ids = self._components()[0]
+        start, end = self._adj_start, self._adj_end
+        in_degree = self._in_degree if self.directed else None
+        component = -1
+        for v in range(len(self._labels)):
+            if end[v] != start[v] or (in_degree is not None and in_degree[v]):
+                if component < 0:
+                    component = ids[v]
+                elif ids[v] != component:
                     return False
-
-            # Проверка сильной связности (упрощенная)
-            if not self._is_strongly_connected():
-                return False
-
         return True
 
-    def _is_connected(self):
-        """Проверяет, является ли неориентированный граф связным"""
-        if not self.vertices:
-            return True
-
-        visited = set()
-        stack = [next(iter(self.vertices))]
-
-        while stack:
-            v = stack.pop()
-            if v not in visited:
-                visited.add(v)
-                for neighbor, _ in self.adjacency_list[v]:
-                    stack.append(neighbor)
-
-        return len(visited) == len(self.vertices)
-
-    def _is_strongly_connected(self):
-        """Проверяет, является ли ориентированный граф сильно связным"""
-        if not self.vertices:
-            return True
-
-        # Проверяем достижимость всех вершин из первой
-        start = next(iter(self.vertices))
-        visited = set()
-        stack = [start]
-
-        while stack:
-            v = stack.pop()
-            if v not in visited:
-                visited.add(v)
-                for neighbor, _ in self.adjacency_list[v]:
-                    stack.append(neighbor)
-
-        if len(visited) != len(self.vertices):
-            return False
+    def bfs(self, sources):
+        """
+        Обход в ширину от вершины или от нескольких вершин сразу
+        (sources - метка или список меток). Генератор меток вершин
+        в порядке посещения; вершина отмечается при постановке в очередь.
+        Расстояния в ребрах и дерево обхода дает bfs_levels.
+        """
+        labels = self._labels
+        start, end, target = self._adj_start, self._adj_end, self._adj_target
+        visited = bytearray(len(labels))
+        queue = deque()
+        for s in self._source_ids(sources):
+            if not visited[s]:
+                visited[s] = 1
+                queue.append(s)
+
+        while queue:
+            u = queue.popleft()
+            yield labels[u]
+            for k in range(start[u], end[u]):
+                v = target[k]
+                if not visited[v]:
+                    visited[v] = 1
+                    queue.append(v)
+
+    def dfs(self, source):
+        """
+        Обход в глубину от вершины source: генератор меток в прямом
+        порядке. Без рекурсии: стек текущего пути и указатель на
+        следующую дугу каждой вершины, поэтому стек не больше n.
+        """
+        labels = self._labels
+        start, end, target = self._adj_start, self._adj_end, self._adj_target
+        s = self._ids[source]
+        visited = bytearray(len(labels))
+        arc = {s: start[s]}  # Следующая непросмотренная дуга вершин пути
+        visited[s] = 1
+        path = [s]
+        yield labels[s]
+
+        while path:
+            u = path[-1]
+            k = arc[u]
+            while k < end[u] and visited[target[k]]:
+                k += 1
+            if k < end[u]:
+                arc[u] = k + 1
+                v = target[k]
+                visited[v] = 1
+                arc[v] = start[v]
+                path.append(v)
+                yield labels[v]
+            else:
+                del arc[u]
+                path.pop()
 
-        # Транспонируем граф
-        reversed_adj = defaultdict(list)
-        for u in self.adjacency_list:
-            for v, weight in self.adjacency_list[u]:
-                reversed_adj[v].append((u, weight))
+    def bfs_levels(self, sources, workers=1):
+        """
+        Поуровневый BFS от вершины или нескольких вершин (sources - метка
+        или список меток): кратчайшие пути без учета весов.
+        Возвращает (hops, parents) - array('q') по местам вершин в порядке
+        get_vertex_labels: число ребер от ближайшего источника (-1 -
+        вершина недостижима) и место предка в дереве обхода (-1 у
+        источников и недостижимых вершин).
+        Фронт расширяется целиком: с NumPy соседи всех его вершин
+        собираются векторной выборкой из плоских массивов смежности.
+        При workers > 1 фронты от PARALLEL_FRONTIER вершин делятся между
+        процессами; смежность и расстояния лежат в разделяемой памяти
+        (граф меньше PARALLEL_FRONTIER вершин обходится в процессе).
+        Каждый следующий фронт упорядочен по номерам вершин, предок -
+        первая достигшая вершину вершина фронта: parents одинаковы с
+        NumPy и без него и при любом workers.
+        """
+        ids = list(dict.fromkeys(self._source_ids(sources)))
+        n = len(self._labels)
+        if np is None:
+            hops, parents = self._bfs_levels_python(ids)
+            order, position = self._vertex_order()
+            return (_permute('q', hops, order),
+                    array('q', (position[parents[u]] if parents[u] >= 0 else -1
+                                for u in order)))
+
+        shm = pool = None
+        start = np.frombuffer(self._adj_start, dtype=np.int64)
+        end = np.frombuffer(self._adj_end, dtype=np.int64)
+        target = np.frombuffer(self._adj_target, dtype=np.int64)
+        try:
+            if workers > 1 and n >= PARALLEL_FRONTIER:
+                size = len(target)
+                shm = SharedMemory(create=True, size=8 * (3 * n + size))
+                shared = np.ndarray((3 * n + size,), dtype=np.int64, buffer=shm.buf)
+                shared[:n], shared[n:2 * n] = start, end
+                shared[2 * n:2 * n + size] = target
+                hops = shared[2 * n + size:]
+                hops.fill(-1)
+                pool = ProcessPoolExecutor(workers, initializer=_attach_shared_frontier,
+                                           initargs=(shm.name, n, size))
+            else:
+                hops = np.full(n, -1, dtype=np.int64)
+            parents = np.full(n, -1, dtype=np.int64)
+
+            frontier = np.array(ids, dtype=np.int64)
+            hops[frontier] = 0
+            level = 0
+            while frontier.size:
+                level += 1
+                if pool is not None and frontier.size >= PARALLEL_FRONTIER:
+                    parts = list(pool.map(_gather_shared, np.array_split(frontier, workers)))
+                    neighbors = np.concatenate([part[0] for part in parts])
+                    reached_from = np.concatenate([part[1] for part in parts])
+                else:
+                    neighbors, reached_from = _gather_frontier(frontier, start, end,
+                                                               target, hops)
+                # Вершина могла встретиться у нескольких вершин фронта:
+                # предком становится первая из них
+                frontier, first = np.unique(neighbors, return_index=True)
+                hops[frontier] = level
+                parents[frontier] = reached_from[first]
+            order, position = (np.frombuffer(values, dtype=np.int64)
+                               for values in self._vertex_order())
+            parents = parents[order]
+            return (_to_array('q', hops[order]),
+                    _to_array('q', np.where(parents >= 0, position[parents], -1)))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if shm is not None:
+                del shared, hops
+                shm.close()
+                shm.unlink()
+
+    def _bfs_levels_python(self, ids):
+        """bfs_levels без NumPy: тот же обход по уровням циклом по фронту"""
+        n = len(self._labels)
+        start, end, target = self._adj_start, self._adj_end, self._adj_target
+        hops = array('q', [-1]) * n
+        parents = array('q', [-1]) * n
+        for s in ids:
+            hops[s] = 0
+        frontier = ids
+        level = 0
+        while frontier:
+            level += 1
+            reached = []
+            for u in frontier:
+                for k in range(start[u], end[u]):
+                    v = target[k]
+                    if hops[v] < 0:
+                        hops[v] = level
+                        parents[v] = u
+                        reached.append(v)
+            # Порядок фронта - как у np.unique в bfs_levels
+            reached.sort()
+            frontier = reached
+        return hops, parents
+
+    def _source_ids(self, sources):
+        """Номера вершин-источников: sources - метка или список меток"""
+        if isinstance(sources, (list, tuple, set, frozenset)):
+            return [self._ids[label] for label in sources]
+        return [self._ids[sources]]
+
+    def connected_components(self):
+        """
+        Компоненты связности (в ориентированном графе - слабой связности):
+        списки меток вершин, компоненты - в порядке первых вершин.
+        Номера компонент кэшируются до изменения графа.
+        """
+        return self._group(*self._components())
 
-        # Проверяем достижимость всех вершин в транспонированном графе
-        visited = set()
-        stack = [start]
+    def connected(self, u, v):
+        """
+        Лежат ли u и v в одной компоненте (слабой) связности.
+        O(1) после первого вызова: система множеств по ребрам хранится
+        и пополняется при добавлении ребер.
+        """
+        i, j = self._ids[u], self._ids[v]
+        sets = self._component_sets()
+        return sets.find(i) == sets.find(j)
 
-        while stack:
-            v = stack.pop()
-            if v not in visited:
-                visited.add(v)
-                for neighbor, _ in reversed_adj[v]:
-                    stack.append(neighbor)
+    def strongly_connected_components(self):
+        """
+        Компоненты сильной связности (в неориентированном графе - просто
+        связности): списки меток вершин в топологическом порядке
+        конденсации - ребра между компонентами идут от ранних к поздним.
+        """
+        return self._group(*self._strong_components())
 
-        return len(visited) == len(self.vertices)
+    def strongly_connected(self, u, v):
+        """Лежат ли u и v в одной компоненте сильной связности, O(1) с кэшем"""
+        ids = self._strong_components()[0]
+        return ids[self._ids[u]] == ids[self._ids[v]]
 
-    def dijkstra(self, start):
+    def condensation(self):
+        """
+        Конденсация: граф компонент сильной связности, всегда ациклический.
+        Возвращает (компоненты, преемники): компоненты - как в
+        strongly_connected_components, преемники[c] - возрастающий список
+        номеров компонент, в которые ведут ребра из c. O(n + m).
+        """
+        ids, count = self._strong_components()
+        start, end, target = self._adj_start, self._adj_end, self._adj_target
+        successors = [set() for _ in range(count)]
+        for u in range(len(self._labels)):
+            c = ids[u]
+            for k in range(start[u], end[u]):
+                d = ids[target[k]]
+                if d != c:
+                    successors[c].add(d)
+        return self._group(ids, count), [sorted(s) for s in successors]
+
+    def _group(self, ids, count):
+        """Списки меток вершин по номерам компонент"""
+        groups = [[] for _ in range(count)]
+        for label, c in zip(self._labels, ids):
+            groups[c].append(label)
+        return groups
+
+    def _component_sets(self):
+        """Система непересекающихся множеств по всем ребрам графа"""
+        if self._component_index is None:
+            sets = DisjointSet(len(self._labels))
+            union = sets.union
+            for u, v in zip(self._edge_u, self._edge_v):
+                union(u, v)
+            self._component_index = sets
+        return self._component_index
+
+    def _components(self):
+        """
+        Номера компонент связности вершин (array('q'), нумерация по первой
+        вершине) и число компонент; кэшируются до изменения графа
+        """
+        if self._component_ids is None:
+            n = len(self._labels)
+            find = self._component_sets().find
+            number = array('q', [-1]) * n
+            ids = array('q', bytes(8 * n))
+            count = 0
+            for v in range(n):
+                root = find(v)
+                if number[root] < 0:
+                    number[root] = count
+                    count += 1
+                ids[v] = number[root]
+            self._component_ids = (ids, count)
+        return self._component_ids
+
+    def _strong_components(self):
+        """
+        Итеративный алгоритм Тарьяна за O(n + m): номера компонент сильной
+        связности (в топологическом порядке конденсации) и их число.
+        Вместо рекурсии - стек вершин и указатель на следующую дугу каждой
+        вершины, поэтому стек не больше n. Кэшируется до изменения графа.
+        """
+        if not self.directed:
+            return self._components()
+        if self._scc_ids is None:
+            n = len(self._labels)
+            start, end, target = self._adj_start, self._adj_end, self._adj_target
+            index = array('q', [-1]) * n
+            low = array('q', bytes(8 * n))
+            ids = array('q', [-1]) * n
+            arc = array('q', start)  # Следующая непросмотренная дуга вершины
+            stack = []               # Вершины, еще не отнесенные к компоненте
+            counter = count = 0
+
+            for root in range(n):
+                if index[root] >= 0:
+                    continue
+                index[root] = low[root] = counter
+                counter += 1
+                stack.append(root)
+                path = [root]        # Текущий путь обхода в глубину
+                while path:
+                    v = path[-1]
+                    k = arc[v]
+                    if k < end[v]:
+                        arc[v] = k + 1
+                        w = target[k]
+                        if index[w] < 0:
+                            index[w] = low[w] = counter
+                            counter += 1
+                            stack.append(w)
+                            path.append(w)
+                        elif ids[w] < 0 and index[w] < low[v]:
+                            # w еще в стеке: обратное или поперечное ребро
+                            low[v] = index[w]
+                        continue
+                    path.pop()
+                    if path and low[v] < low[path[-1]]:
+                        low[path[-1]] = low[v]
+                    if low[v] == index[v]:
+                        while True:
+                            w = stack.pop()
+                            ids[w] = count
+                            if w == v:
+                                break
+                        count += 1
+
+            # Тарьян выдает компоненты в обратном топологическом порядке
+            for v in range(n):
+                ids[v] = count - 1 - ids[v]
+            self._scc_ids = (ids, count)
+        return self._scc_ids
+
+    def _reverse_arrays(self, full=False):
+        """
+        Плоские массивы смежности по входящим ребрам: (начала, концы,
+        соседи, веса), как _adj_*; при full=True - все шесть массивов
+        (с емкостями и номерами ребер). В неориентированном графе совпадают
+        с обычными; в ориентированном строятся лениво и затем
+        поддерживаются методами изменения графа.
+        """
+        if not self.directed:
+            adjacency = self._forward()
+        else:
+            if self._reverse_adjacency is None:
+                # Транспонируем граф: плоские массивы обратных ребер
+                reverse = Graph(directed=True, path_cache_bytes=0)
+                reverse._labels = self._labels
+                reverse._edge_u, reverse._edge_v = self._edge_v, self._edge_u
+                reverse._edge_w = self._edge_w
+                reverse._build_adjacency()
+                self._reverse_adjacency = reverse._forward()
+            adjacency = self._reverse_adjacency
+        if full:
+            return adjacency
+        start, end, _, target, weights, _ = adjacency
+        return start, end, target, weights
+
+    def dijkstra(self, start, predecessors=False):
         """
         Алгоритм Дейкстры для поиска кратчайших путей от заданной вершины.
         Возвращает словарь расстояний до всех вершин.
+        При predecessors=True возвращает пару (расстояния, предки), где
+        предки - словарь {метка: метка предыдущей вершины на кратчайшем
+        пути или None}. Результаты кэшируются в path_cache.
+        """
+        labels = self._labels
+        source = self._ids.get(start)
+        if source is None:
+            distances = dict.fromkeys(labels, float('inf'))
+            distances[start] = 0
+            if predecessors:
+                return distances, dict.fromkeys(distances)
+            return distances
+
+        distances, parents = self._single_source(source)
+        if predecessors:
+            return (dict(zip(labels, distances)),
+                    {labels[v]: labels[p] if p >= 0 else None
+                     for v, p in enumerate(parents)})
+        return dict(zip(labels, distances))
+
+    def _single_source(self, source):
         """
-        distances = {v: float('inf') for v in self.vertices}
-        distances[start] = 0
-        heap = [(0, start)]
+        Расстояния и предки от вершины с номером source
+        (array('d') и array('q')) - из кэша или новым запуском Дейкстры
+        """
+        entry = self.path_cache.get(source)
+        if entry is None:
+            parents = [-1] * len(self._labels)
+            distances = _dijkstra_distances(source, self._adj_start, self._adj_end,
+                                            self._adj_target, self._adj_weight, parents)
+            entry = (array('d', distances), array('q', parents))
+            self.path_cache.put(source, *entry)
+        return entry
+
+    def shortest_path(self, source, target, method=None, heuristic=None):
+        """
+        Кратчайший путь из source в target.
+        Возвращает пару (длина, список меток пути) или (inf, None), если
+        пути нет. Поиск останавливается, как только target достигнут,
+        и посещает только нужную часть графа.
+        method: "dijkstra" - Дейкстра до извлечения target из кучи;
+        "bidirectional" - встречные Дейкстры от source и от target
+        (по входящим ребрам); "astar" - A*, heuristic(метка) - нижняя
+        оценка расстояния от вершины до target. По умолчанию - "astar",
+        если передан heuristic, иначе "dijkstra".
+        """
+        if method is None:
+            method = "astar" if heuristic is not None else "dijkstra"
+        if method not in ("dijkstra", "bidirectional", "astar"):
+            raise ValueError("Неизвестный метод: %r" % (method,))
+        if method == "astar" and heuristic is None:
+            raise ValueError("Для A* нужна функция heuristic")
+
+        s = self._ids.get(source)
+        t = self._ids.get(target)
+        if s is None or t is None:
+            return float('inf'), None
+        if s == t:
+            return 0, [source]
+
+        if method != "astar" and s in self.path_cache:
+            # Дерево путей от source уже посчитано
+            distances, parents = self.path_cache.get(s)
+            distance, path = distances[t], None
+            if parents[t] >= 0:
+                path = [t]
+                while path[-1] != s:
+                    path.append(parents[path[-1]])
+                path.reverse()
+        elif method == "bidirectional":
+            distance, path = self._bidirectional_path(s, t)
+        else:
+            distance, path = self._astar_path(s, t, heuristic)
+        if path is None:
+            return float('inf'), None
+        return distance, [self._labels[v] for v in path]
 
-        while heap:
-            current_dist, u = heapq.heappop(heap)
+    def _astar_path(self, s, t, heuristic=None):
+        """
+        A* от s до t по номерам вершин; без heuristic - Дейкстра
+        с остановкой на t. Расстояния и предки - в словарях, чтобы не
+        заводить массивы на весь граф. Возвращает (длина, номера пути).
+        """
+        labels = self._labels
+        adj_start, adj_end = self._adj_start, self._adj_end
+        target, weights = self._adj_target, self._adj_weight
+        distances = {s: 0}
+        predecessors = {}
+        estimates = {}  # Значения heuristic, каждое считается один раз
+        heap = [(0, 0, s)]
 
+        while heap:
+            _, current_dist, u = heapq.heappop(heap)
             if current_dist > distances[u]:
                 continue
+            if u == t:
+                return current_dist, _unwind(predecessors, t)
 
-            for v, weight in self.adjacency_list[u]:
-                distance = current_dist + weight
-                if distance < distances[v]:
+            for k in range(adj_start[u], adj_end[u]):
+                v = target[k]
+                distance = current_dist + weights[k]
+                if distance < distances.get(v, float('inf')):
                     distances[v] = distance
-                    heapq.heappush(heap, (distance, v))
-
-        return distances
+                    predecessors[v] = u
+                    priority = distance
+                    if heuristic is not None:
+                        h = estimates.get(v)
+                        if h is None:
+                            h = estimates[v] = heuristic(labels[v])
+                        priority += h
+                    heapq.heappush(heap, (priority, distance, v))
+
+        return float('inf'), None
+
+    def _bidirectional_path(self, s, t):
+        """
+        Двунаправленная Дейкстра: поиск вперед от s и назад от t по
+        входящим ребрам, каждый раз продвигается сторона с меньшим ключом.
+        Останавливается, когда сумма ключей вершин куч не меньше лучшего
+        найденного пути через общую вершину.
+        """
+        forward = ([(0, s)], {s: 0}, {}, (self._adj_start, self._adj_end,
+                                          self._adj_target, self._adj_weight))
+        backward = ([(0, t)], {t: 0}, {}, self._reverse_arrays())
+        best = float('inf')
+        meet = -1
+
+        while forward[0] and backward[0]:
+            if forward[0][0][0] + backward[0][0][0] >= best:
+                break
+            if forward[0][0][0] <= backward[0][0][0]:
+                side, other = forward, backward
+            else:
+                side, other = backward, forward
+            heap, distances, predecessors, (start, end, target, weights) = side
+            other_distances = other[1]
 
-    def floyd_warshall(self):
+            current_dist, u = heapq.heappop(heap)
+            if current_dist > distances[u]:
+                continue
+            for k in range(start[u], end[u]):
+                v = target[k]
+                distance = current_dist + weights[k]
+                if distance < distances.get(v, float('inf')):
+                    distances[v] = distance
+                    predecessors[v] = u
+                    heapq.heappush(heap, (distance, v))
+                    through = other_distances.get(v)
+                    if through is not None and distance + through < best:
+                        best = distance + through
+                        meet = v
+
+        if meet < 0:
+            return float('inf'), None
+        path = _unwind(forward[2], meet)
+        v = meet
+        while v != t:
+            v = backward[2][v]
+            path.append(v)
+        return best, path
+
+    def floyd_warshall(self, next_hop=False):
         """
         Алгоритм Флойда-Уоршелла для поиска кратчайших путей между всеми парами вершин.
-        Возвращает матрицу кратчайших расстояний.
+        Возвращает матрицу кратчайших расстояний (порядок вершин - get_vertex_labels).
+        При next_hop=True возвращает пару (расстояния, следующие вершины):
+        next[i][j] - номер вершины, следующей за i на кратчайшем пути в j
+        (-1, если пути нет); путь восстанавливает path_from_next_hop.
+        Если установлен NumPy, считается векторно (floyd_warshall_array),
+        иначе - на чистом Python.
         """
-        vertices = sorted(self.vertices)
-        n = len(vertices)
-        vertex_index = {v: i for i, v in enumerate(vertices)}
+        if np is not None:
+            result = self.floyd_warshall_array(next_hop=next_hop)
+            if next_hop:
+                return result[0].tolist(), result[1].tolist()
+            return result.tolist()
+
+        n = len(self._labels)
+        inf = float('inf')
+        position = self._vertex_order()[1]
 
         # Инициализация матрицы расстояний
-        dist = [[float('inf')] * n for _ in range(n)]
+        dist = [[inf] * n for _ in range(n)]
         for i in range(n):
             dist[i][i] = 0
 
         # Заполнение известными расстояниями
-        for u, v, weight in self.edges:
-            i = vertex_index[u]
-            j = vertex_index[v]
+        for u, v, weight in zip(self._edge_u, self._edge_v, self._edge_w):
+            i, j = position[u], position[v]
             if weight < dist[i][j]:
                 dist[i][j] = weight
                 if not self.directed:
                     dist[j][i] = weight
 
-        # Алгоритм Флойда-Уоршелла
+        nxt = None
+        if next_hop:
+            nxt = [[j if dist[i][j] < inf else -1 for j in range(n)]
+                   for i in range(n)]
+
+        # Алгоритм Флойда-Уоршелла: строка k и столбец k на шаге k не меняются,
+        # поэтому берем их один раз и пропускаем строки без пути в k
         for k in range(n):
+            row_k = dist[k]
             for i in range(n):
+                row_i = dist[i]
+                d_ik = row_i[k]
+                if d_ik == inf:
+                    continue
                 for j in range(n):
-                    if dist[i][k] + dist[k][j] < dist[i][j]:
-                        dist[i][j] = dist[i][k] + dist[k][j]
-
+                    d = d_ik + row_k[j]
+                    if d < row_i[j]:
+                        row_i[j] = d
+                        if nxt is not None:
+                            nxt[i][j] = nxt[i][k]
+
+        if next_hop:
+            return dist, nxt
         return dist
 
+    def floyd_warshall_array(self, next_hop=False, block_size=None,
+                             memmap_path=None, dtype=None):
+        """
+        Флойд-Уоршелл на NumPy. Возвращает ndarray расстояний n x n
+        (и матрицу следующих вершин int64 при next_hop=True); строки и
+        столбцы - в порядке get_vertex_labels.
+        На шаге k вся матрица обновляется одной операцией:
+        D = minimum(D, D[:, k] + D[k, :]).
+        При заданном block_size используется блочный вариант: матрица
+        обрабатывается полосами по block_size строк, и в памяти одновременно
+        находятся только O(block_size * n) элементов. Тогда матрицу можно
+        держать на диске: memmap_path - файл для np.memmap (матрица следующих
+        вершин - в memmap_path + '.next'), dtype - например np.float32,
+        чтобы вдвое уменьшить файл.
+        """
+        if np is None:
+            raise ImportError("Для floyd_warshall_array нужен NumPy")
+        n = len(self._labels)
+        dtype = np.dtype(np.float64 if dtype is None else dtype)
 
-    def print_incidence_matrix_by_columns(self):
-        """Выводит матрицу инцидентности по столбцам"""
-        if not self.incidence_matrix:
-            print("Матрица инцидентности не построена")
-            return
+        if memmap_path is not None:
+            dist = np.memmap(memmap_path, dtype=dtype, mode='w+', shape=(n, n))
+        else:
+            dist = np.empty((n, n), dtype=dtype)
+        dist.fill(np.inf)
+        np.fill_diagonal(dist, 0)
+
+        # Кратные ребра: остается минимальный вес
+        position = np.frombuffer(self._vertex_order()[1], dtype=np.int64)
+        u = position[np.frombuffer(self._edge_u, dtype=np.int64)]
+        v = position[np.frombuffer(self._edge_v, dtype=np.int64)]
+        w = np.frombuffer(self._edge_w, dtype=np.float64).astype(dtype)
+        if not self.directed:
+            u, v, w = np.concatenate((u, v)), np.concatenate((v, u)), np.concatenate((w, w))
+        np.minimum.at(dist, (u, v), w)
+
+        nxt = None
+        if next_hop:
+            if memmap_path is not None:
+                nxt = np.memmap(memmap_path + '.next', dtype=np.int64,
+                                mode='w+', shape=(n, n))
+            else:
+                nxt = np.empty((n, n), dtype=np.int64)
+            # Полосами по block_size строк; пустой граф - без полос
+            step = block_size or max(n, 1)
+            for start in range(0, n, step):
+                rows = dist[start:start + step]
+                nxt[start:start + len(rows)] = np.where(
+                    np.isfinite(rows), np.arange(n), -1)
+
+        if block_size is None:
+            _minplus_update(dist, nxt, dist, nxt, dist)
+        else:
+            _blocked_floyd_warshall(dist, nxt, block_size)
+
+        if memmap_path is not None:
+            dist.flush()
+            if nxt is not None:
+                nxt.flush()
+        if next_hop:
+            return dist, nxt
+        return dist
 
-        vertices = sorted(self.vertices)
-        edges = self.edges
-        n = len(vertices)
-        m = len(edges)
+    def path_from_next_hop(self, nxt, source, target):
+        """
+        Восстанавливает кратчайший путь source -> target по матрице
+        следующих вершин из floyd_warshall(next_hop=True).
+        Возвращает список меток или None, если пути нет.
+        """
+        order, position = self._vertex_order()
+        i = position[self._ids[source]]
+        j = position[self._ids[target]]
+        if nxt[i][j] < 0:
+            return None
+        path = [i]
+        while i != j:
+            i = int(nxt[i][j])
+            path.append(i)
+        return [self._labels[order[k]] for k in path]
+
+    def all_pairs_shortest_paths(self, workers=1, method="auto", batch_size=None):
+        """
+        Кратчайшие расстояния между всеми парами вершин, по строкам.
+        Генератор пар (метка источника, array('d') расстояний в порядке
+        get_vertex_labels), источники - в том же порядке: полная матрица
+        целиком не хранится.
+        method: "dijkstra" - Дейкстра от каждой вершины, "floyd_warshall",
+        "auto" - Флойд-Уоршелл, если заполнение матрицы смежности не
+        меньше APSP_DENSITY, иначе Дейкстра.
+        Дейкстра выполняется в workers процессах (по умолчанию, как у
+        bfs_levels, - в текущем процессе; None - по числу ядер). Смежность передается исполнителям
+        один раз через разделяемую память, задачи - пачки по batch_size
+        источников; одновременно в работе не больше 2 * workers пачек.
+        """
+        if method not in ("auto", "dijkstra", "floyd_warshall"):
+            raise ValueError("Неизвестный метод: %r" % (method,))
+        labels = self._labels
+        n = len(labels)
+        order = self._vertex_order()[0]
+        if method == "auto":
+            arcs = len(self._edge_w) * (1 if self.directed else 2)
+            method = "floyd_warshall" if arcs >= APSP_DENSITY * n * n else "dijkstra"
+
+        if method == "floyd_warshall":
+            labels = self.get_vertex_labels()
+            if np is not None:
+                for label, row in zip(labels, self.floyd_warshall_array()):
+                    yield label, _to_array('d', row)
+            else:
+                for label, row in zip(labels, self.floyd_warshall()):
+                    yield label, array('d', row)
+            return
 
-        print("\nМатрица инцидентности (по столбцам):")
-        print("   " + " ".join(f"E{i + 1:>5}" for i in range(m)))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1 or n < 2:
+            for source in order:
+                yield labels[source], _permute('d', _dijkstra_distances(
+                    source, self._adj_start, self._adj_end,
+                    self._adj_target, self._adj_weight), order)
+            return
 
-        # Транспонируем матрицу для вывода по столбцам
-        transposed = [[self.incidence_matrix[j][i] for j in range(n)] for i in range(m)]
+        if batch_size is None:
+            batch_size = max(1, min(256, n // (4 * workers)))
+        size = len(self._adj_target)
+        shm = SharedMemory(create=True, size=16 * (n + size))
+        try:
+            offset = 0
+            for part in (self._adj_start, self._adj_end, self._adj_target, self._adj_weight):
+                nbytes = 8 * len(part)
+                shm.buf[offset:offset + nbytes] = memoryview(part).cast('B')
+                offset += nbytes
+
+            pool = ProcessPoolExecutor(workers, initializer=_attach_shared_adjacency,
+                                       initargs=(shm.name, n, size))
+            try:
+                pending = deque()
+                for first in range(0, n, batch_size):
+                    sources = order[first:first + batch_size]
+                    pending.append((sources, pool.submit(_dijkstra_rows, sources)))
+                    while len(pending) >= 2 * workers:
+                        sources, future = pending.popleft()
+                        for i, row in zip(sources, future.result()):
+                            yield labels[i], _permute('d', row, order)
+                while pending:
+                    sources, future = pending.popleft()
+                    for i, row in zip(sources, future.result()):
+                        yield labels[i], _permute('d', row, order)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def print_incidence_matrix_by_columns(self, out=None):
+        """Выводит матрицу инцидентности по столбцам"""
+        if not self._labels:
+            print("Матрица инцидентности не построена", file=out)
+            return
 
-        for i in range(n):
-            print(f"{vertices[i]:>3}", end=" ")
-            for j in range(m):
-                print(f"{transposed[j][i]:>5}", end=" ")
-            print()
-graph = Graph("graph.txt", directed=False)
-# Задача 1: Различные представления графа
-print("Матрица смежности:")
-print(graph.get_adjacency_matrix())
-
-print("\nМатрица инцидентности:")
-print(graph.get_incidence_matrix())
-
-print("\nСписок ребер:")
-print(graph.get_edge_list())
-
-print("\nСписок смежности:")
-print(dict(graph.get_adjacency_list()))
-
-# Задача 2: Минимальное остовное дерево (алгоритм Краскала)
-print("\nМинимальное остовное дерево (Краскал):")
-mst = graph.kruskal_mst()
-for edge in mst:
-    print(f"{edge[0]} - {edge[1]}: {edge[2]}")
-
-# Задача 3: Проверка на Эйлеров цикл
-print("\nГраф содержит Эйлеров цикл:", graph.has_eulerian_cycle())
-
-# Задача 4: Кратчайшие пути от заданной вершины (алгоритм Дейкстры)
-start_vertex = "A"  # Пример вершины
-print(f"\nКратчайшие пути от вершины {start_vertex}:")
-distances = graph.dijkstra(start_vertex)
-for v, dist in distances.items():
-    print(f"До {v}: {dist}")
-
-# Задача 5: Матрица кратчайших путей (алгоритм Флойда-Уоршелла)
-print("\nМатрица кратчайших путей (Флойд-Уоршелл):")
-floyd_matrix = graph.floyd_warshall()
-for row in floyd_matrix:
-    print(row)
\ No newline at end of file
+        out = sys.stdout if out is None else out
+        out.write("\nМатрица инцидентности (по столбцам):\n")
+        self._export(out, "incidence", "text", None, None, column_prefix="E")
+
+
+if __name__ == '__main__':
+    # Разобранный граф сохраняется в снимок рядом с текстом и при
+    # следующих запусках открывается из него, пока graph.txt не изменится
+    snapshot = "graph.bin"
+    if os.path.exists(snapshot) and os.path.getmtime(snapshot) >= os.path.getmtime("graph.txt"):
+        graph = Graph.open_binary(snapshot)
+    else:
+        graph = Graph("graph.txt", directed=False)
+        graph.save_binary(snapshot)
+    # Задача 1: Различные представления графа
+    print("Матрица смежности:")
+    print(graph.get_adjacency_matrix())
+
+    print("\nМатрица инцидентности:")
+    print(graph.get_incidence_matrix())
+
+    print("\nСписок ребер:")
+    print(graph.get_edge_list())
+
+    print("\nСписок смежности:")
+    print(dict(graph.get_adjacency_list()))
+
+    # Задача 2: Минимальное остовное дерево (алгоритм Краскала)
+    print("\nМинимальное остовное дерево (Краскал):")
+    mst = graph.kruskal_mst()
+    for edge in mst:
+        print(f"{edge[0]} - {edge[1]}: {edge[2]}")
+
+    # Задача 3: Проверка на Эйлеров цикл
+    print("\nГраф содержит Эйлеров цикл:", graph.has_eulerian_cycle())
+
+    # Задача 4: Кратчайшие пути от заданной вершины (алгоритм Дейкстры)
+    start_vertex = "A"  # Пример вершины
+    print(f"\nКратчайшие пути от вершины {start_vertex}:")
+    distances = graph.dijkstra(start_vertex)
+    for v, dist in distances.items():
+        print(f"До {v}: {dist}")
+
+    # Задача 5: Матрица кратчайших путей (алгоритм Флойда-Уоршелла)
+    print("\nМатрица кратчайших путей (Флойд-Уоршелл):")
+    floyd_matrix = graph.floyd_warshall()
+    for row in floyd_matrix:
+        print(row)
@@ -0,0 +1,316 @@
+'''
+Замеры производительности Tree (main.py) и Graph (Laba4/main.py).
+
+Для каждой операции, вида входных данных и размера записывается лучшее
+время из --repeat прогонов и пиковая память (tracemalloc, отдельным
+прогоном). Результаты выводятся в JSON или CSV, чтобы их можно было
+сравнивать между коммитами.
+
+Запуск из корня репозитория:
+    python benchmarks/bench.py --sizes 1e3,1e4,1e5 --output results.json
+    python benchmarks/bench.py --suite graph --format csv
+'''
+import argparse
+import csv
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name, path):
+    '''
+    Загрузка модуля по пути: в репозитории два файла main.py,
+    поэтому обычный import их не различит
+    '''
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+tree_main = load_module("tree_main", "main.py")
+graph_main = load_module("graph_main", os.path.join("Laba4", "main.py"))
+
+INPUTS = ("random", "sorted", "adversarial")
+
+# Варианты дерева: (имя, параметры конструктора)
+TREE_VARIANTS = (
+    ("plain", {}),
+    ("avl", {"balanced": "avl"}),
+    ("avl-array", {"balanced": "avl", "storage": "array"}),
+)
+
+# Наибольшие размеры для операций, которые иначе не закончатся:
+# несбалансированное дерево на упорядоченных ключах вырождается в список
+# (O(n^2) вставок), а Флойд-Уоршелл кубический.
+LIMITS = {
+    ("tree", "plain", "sorted"): 5000,
+    ("tree", "plain", "adversarial"): 5000,
+    ("graph", "floyd_warshall"): 2000,
+}
+
+
+def tree_keys(kind, n, rnd):
+    '''
+    Ключи для дерева: случайная перестановка, возрастающая
+    последовательность или "пила" из концов диапазона к середине,
+    которая вырождает несбалансированное дерево так же, как сортировка
+    '''
+    if kind == "random":
+        keys = list(range(n))
+        rnd.shuffle(keys)
+        return keys
+    if kind == "sorted":
+        return list(range(n))
+    keys = []
+    lo, hi = 0, n - 1
+    while lo <= hi:
+        keys.append(lo)
+        if lo != hi:
+            keys.append(hi)
+        lo += 1
+        hi -= 1
+    return keys
+
+
+def graph_edges(kind, n, rnd):
+    '''
+    Ребра графа на n вершинах:
+    random - около 4n случайных ребер со случайными весами;
+    sorted - путь 0-1-...-(n-1) и хорды (i, i+7), упорядоченные по весу;
+    adversarial - путь плюс 8 вершин-хабов, соединенных со всеми
+    вершинами убывающими весами: много перестановок в куче Дейкстры
+    и вершины с огромной степенью
+    '''
+    edges = []
+    if kind == "random":
+        for _ in range(4 * n):
+            u, v = rnd.randrange(n), rnd.randrange(n)
+            edges.append((u, v, round(rnd.uniform(1, 100), 2)))
+        # Путь гарантирует связность
+        edges.extend((i, i + 1, 100.0) for i in range(n - 1))
+    elif kind == "sorted":
+        edges.extend((i, i + 1, float(i + 1)) for i in range(n - 1))
+        edges.extend((i, i + 7, float(n + i)) for i in range(n - 7))
+    else:
+        edges.extend((i, i + 1, 1.0) for i in range(n - 1))
+        hubs = min(8, n)
+        for h in range(hubs):
+            edges.extend((h, v, float(2 * n - v)) for v in range(hubs, n))
+    return edges
+
+
+def write_edge_file(edges, path):
+    '''
+    Запись ребер в текстовый формат, который читает Graph.load_from_file
+    '''
+    with open(path, 'w') as f:
+        f.writelines("%d %d %r\n" % e for e in edges)
+
+
+def measure(func, repeat, memory):
+    '''
+    Лучшее время из repeat запусков func() и, если нужно, пиковая память
+    отдельного запуска под tracemalloc. setup-часть func должна быть
+    вынесена наружу: замеряется весь вызов.
+    '''
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def record(suite, op, variant, kind, n, ops, seconds, peak, **extra):
+    '''
+    Одна строка результатов
+    '''
+    row = {
+        "suite": suite, "op": op, "variant": variant, "input": kind, "n": n,
+        "ops": ops, "seconds": seconds,
+        "ns_per_op": seconds / ops * 1e9 if ops else None,
+        "peak_bytes": peak,
+    }
+    row.update(extra)
+    return row
+
+
+def limited(key, n):
+    '''
+    Превышает ли n предел из LIMITS
+    '''
+    limit = LIMITS.get(key)
+    return limit is not None and n > limit
+
+
+def bench_tree(sizes, inputs, repeat, memory, seed, log):
+    '''
+    Замеры Tree: add (построение вставками), find (n поисков,
+    половина промахов) и height
+    '''
+    results = []
+    for name, params in TREE_VARIANTS:
+        for kind in inputs:
+            for n in sizes:
+                if limited(("tree", name, kind), n):
+                    log("пропуск tree/%s/%s n=%d: выше предела" % (name, kind, n))
+                    continue
+                rnd = random.Random(seed)
+                keys = tree_keys(kind, n, rnd)
+                probes = [rnd.randrange(2 * n) for _ in range(n)]
+                built = []
+
+                def build():
+                    tree = tree_main.Tree(**params)
+                    add = tree.add
+                    for key in keys:
+                        add(key)
+                    built[:] = [tree]
+
+                seconds, peak = measure(build, repeat, memory)
+                results.append(record("tree", "add", name, kind, n, n, seconds, peak))
+                tree = built[0]
+
+                def lookups():
+                    find = tree.find
+                    for key in probes:
+                        find(key)
+
+                seconds, _ = measure(lookups, repeat, False)
+                results.append(record("tree", "find", name, kind, n, n, seconds, None))
+
+                seconds, _ = measure(tree.height, repeat, False)
+                results.append(record("tree", "height", name, kind, n, 1, seconds, None,
+                                      height=tree.height()))
+                log("tree/%s/%s n=%d готово" % (name, kind, n))
+                del built[:], tree
+    return results
+
+
+def bench_graph(sizes, inputs, repeat, memory, seed, log):
+    '''
+    Замеры Graph: load_from_file, dijkstra и bfs_levels от вершины 0,
+    kruskal_mst и floyd_warshall
+    '''
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in inputs:
+            for n in sizes:
+                edges = graph_edges(kind, n, random.Random(seed))
+                m = len(edges)
+                path = os.path.join(tmp, "%s-%d.txt" % (kind, n))
+                write_edge_file(edges, path)
+                del edges
+                loaded = []
+
+                def load():
+                    # без кэша путей: иначе повторы dijkstra замеряют попадания в кэш
+                    loaded[:] = [graph_main.Graph(path, path_cache_bytes=0)]
+
+                seconds, peak = measure(load, repeat, memory)
+                results.append(record("graph", "load_from_file", "undirected", kind, n,
+                                      m, seconds, peak, m=m,
+                                      file_bytes=os.path.getsize(path)))
+                graph = loaded[0]
+
+                ops = [
+                    ("dijkstra", lambda: graph.dijkstra("0"), m),
+                    ("bfs_levels", lambda: graph.bfs_levels("0"), m),
+                    ("kruskal_mst", graph.kruskal_mst, m),
+                ]
+                if not limited(("graph", "floyd_warshall"), n):
+                    ops.append(("floyd_warshall", graph.floyd_warshall, n ** 3))
+                for op, func, count in ops:
+                    seconds, peak = measure(func, repeat, memory)
+                    results.append(record("graph", op, "undirected", kind, n,
+                                          count, seconds, peak, m=m))
+                log("graph/%s n=%d готово" % (kind, n))
+                del loaded[:], graph
+                os.remove(path)
+    return results
+
+
+def parse_sizes(text):
+    '''
+    Размеры через запятую, допускается запись вида 1e5
+    '''
+    return [int(float(part)) for part in text.split(',') if part.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--suite', choices=('all', 'tree', 'graph'), default='all')
+    parser.add_argument('--sizes', default='1e3,1e4,1e5',
+                        help='размеры входа через запятую (до 1e7)')
+    parser.add_argument('--inputs', default=','.join(INPUTS),
+                        help='виды входных данных: ' + ', '.join(INPUTS))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='число прогонов, берется лучшее время')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='не измерять пиковую память')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--format', choices=('json', 'csv'), default='json')
+    parser.add_argument('--output', help='файл для результатов (по умолчанию stdout)')
+    parser.add_argument('--quiet', action='store_true', help='не печатать ход замеров')
+    args = parser.parse_args(argv)
+
+    sizes = parse_sizes(args.sizes)
+    inputs = [k for k in args.inputs.split(',') if k]
+    unknown = set(inputs) - set(INPUTS)
+    if unknown:
+        parser.error("неизвестные виды входа: %s" % ', '.join(sorted(unknown)))
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    memory = not args.no_memory
+    results = []
+    if args.suite in ('all', 'tree'):
+        results += bench_tree(sizes, inputs, args.repeat, memory, args.seed, log)
+    if args.suite in ('all', 'graph'):
+        results += bench_graph(sizes, inputs, args.repeat, memory, args.seed, log)
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "results": results,
+            }, out, indent=2)
+            out.write('\n')
+        else:
+            fields = []
+            for row in results:
+                fields.extend(k for k in row if k not in fields)
+            writer = csv.DictWriter(out, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(results)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+'''
+Стресс-тест ConcurrentTree: пропускная способность читателей
+при растущей нагрузке писателя.
+
+Запуск из корня репозитория:
+    python benchmarks/concurrent_tree.py --keys 100000 --readers 4
+'''
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from main import ConcurrentTree  # noqa: E402
+
+
+def run_level(tree, key_space, readers, duration, write_rate):
+    '''
+    Один замер: readers потоков выполняют find, пока один писатель
+    чередует add и delete с частотой write_rate операций в секунду
+    (None - без ограничения, 0 - писателя нет).
+    Возвращает словарь с числом чтений и записей в секунду.
+    '''
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0]
+
+    def reader(slot):
+        rnd = random.Random(slot)
+        find = tree.find
+        count = 0
+        while not stop.is_set():
+            for _ in range(256):
+                find(rnd.randrange(key_space))
+            count += 256
+        reads[slot] = count
+
+    def writer():
+        rnd = random.Random(-1)
+        start = time.perf_counter()
+        done = 0
+        while not stop.is_set():
+            if write_rate is not None:
+                # Ждем, пока не подойдет время следующей записи
+                lag = start + done / write_rate - time.perf_counter()
+                if lag > 0:
+                    stop.wait(lag)
+                    continue
+            key = rnd.randrange(key_space)
+            if done % 2:
+                tree.delete(key)
+            else:
+                tree.add(key)
+            done += 1
+        writes[0] = done
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    if write_rate != 0:
+        threads.append(threading.Thread(target=writer))
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+    return {
+        "write_rate": write_rate,
+        "reads_per_sec": sum(reads) / elapsed,
+        "writes_per_sec": writes[0] / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--keys', type=int, default=100000,
+                        help='число ключей в дереве перед замером')
+    parser.add_argument('--readers', type=int, default=4,
+                        help='число потоков-читателей')
+    parser.add_argument('--duration', type=float, default=2.0,
+                        help='длительность одного замера, секунд')
+    parser.add_argument('--rates', default='0,100,1000,10000,max',
+                        help='частоты записи через запятую, max - без ограничения')
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результаты в JSON')
+    args = parser.parse_args(argv)
+
+    key_space = args.keys * 2
+    tree = ConcurrentTree.from_iterable(range(0, key_space, 2), presorted=True,
+                                        balanced="avl")
+    rates = [None if r == 'max' else int(r) for r in args.rates.split(',')]
+    results = [run_level(tree, key_space, args.readers, args.duration, rate)
+               for rate in rates]
+
+    if args.json:
+        json.dump({"keys": args.keys, "readers": args.readers,
+                   "duration": args.duration, "results": results},
+                  sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    print("%12s %16s %16s" % ("записей/с", "чтений/с", "факт записей/с"))
+    for r in results:
+        rate = "max" if r["write_rate"] is None else r["write_rate"]
+        print("%12s %16.0f %16.0f" % (rate, r["reads_per_sec"], r["writes_per_sec"]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,188 @@
-from queue import Queue # Для обхода в ширину
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from heapq import merge
+from itertools import islice
+import mmap
 import random
+import struct
+import sys
+import threading
+
+# Заголовок снимка дерева: сигнатура, тип ключей, режим балансировки,
+# выравнивание до 8 байт, количество ключей
+SNAPSHOT_HEADER = struct.Struct('<8scc6xq')
+SNAPSHOT_MAGIC = b'BSTSNAP1'
 
 
 class Node:
     '''
-    Класс для хранения единичного узла бинарного дерева
+    Класс для хранения единичного узла бинарного дерева.
+    __slots__ убирает у каждого узла словарь атрибутов.
     '''
+    __slots__ = ('l', 'r', 'v', 'h', 's', 'lc')
+
     def __init__(self, val):
         self.l = None  # Связь с левым потомком
         self.r = None  # Связь с правым потомком
         self.v = val   # Ключ (значение, которое хранится в узле)
+        self.h = 1     # Высота поддерева с корнем в узле
+        self.s = 1     # Количество узлов в поддереве
+        self.lc = 1    # Количество листьев в поддереве
+
+    def copy(self):
+        '''
+        Копия узла с теми же потомками и агрегатами
+        '''
+        node = Node.__new__(Node)
+        node.l, node.r, node.v = self.l, self.r, self.v
+        node.h, node.s, node.lc = self.h, self.s, self.lc
+        return node
 
 class Tree:
     '''
-    Класс для хранения бинарного дерева поиска
+    Класс для хранения бинарного дерева поиска.
+    При balanced="avl" дерево самобалансирующееся (AVL): после каждой
+    вставки и удаления высота поддеревьев выравнивается поворотами,
+    поэтому add, find и delete работают за O(log n) даже на
+    отсортированных ключах.
+    Каждый узел хранит размер, высоту и число листьев своего поддерева,
+    поэтому статистика дерева доступна за O(1), а rank и select
+    работают за время, пропорциональное высоте.
+    При storage="array" создается ArrayTree: узлы хранятся
+    в параллельных массивах array вместо отдельных объектов Node.
     '''
-    def __init__(self):
+    BALANCE_MODES = (None, "avl")
+    STORAGE_MODES = ("object", "array")
+
+    _nil = None  # Обозначение отсутствующего узла
+
+    WRITE_BLOCK = 4096  # Сколько ключей выводить одной записью
+    PRETTY_LEVELS = 8   # Сколько уровней по умолчанию показывает prettyPrint
+
+    def __new__(cls, balanced=None, storage="object"):
+        '''
+        Выбор класса хранилища при создании дерева
+        '''
+        if cls is Tree and storage == "array":
+            cls = ArrayTree
+        return super().__new__(cls)
+
+    def __init__(self, balanced=None, storage="object"):
         '''
         Создаем пустое дерево
         '''
+        if balanced not in self.BALANCE_MODES:
+            raise ValueError("Неизвестный режим балансировки: %r" % (balanced,))
+        if storage not in self.STORAGE_MODES:
+            raise ValueError("Неизвестный тип хранилища: %r" % (storage,))
         self.root = None
+        self.balanced = balanced
+        self.storage = storage
+
+    @classmethod
+    def from_iterable(cls, keys, presorted=False, balanced=None, storage=None):
+        '''
+        Построение идеально сбалансированного дерева из набора ключей.
+        Ключи сортируются один раз (или берутся как есть при presorted=True),
+        после чего дерево собирается за один линейный проход:
+        средний ключ становится корнем, половины - поддеревьями.
+        '''
+        if storage is None:
+            tree = cls(balanced=balanced)
+        else:
+            tree = cls(balanced=balanced, storage=storage)
+        tree.root = tree._build(list(keys) if presorted else sorted(keys))
+        return tree
+
+    def extend(self, keys):
+        '''
+        Пакетное добавление ключей.
+        Если пакет сравним по размеру с деревом, сливаем его с уже
+        отсортированными ключами дерева и перестраиваем дерево целиком
+        за O(n + k); небольшие пакеты добавляем по одному ключу.
+        '''
+        keys = list(keys)
+        size = self._countNodes(self.root)
+        if len(keys) * 8 < size:
+            for val in keys:
+                self.add(val)
+            return
+        keys.sort()
+        if size:
+            keys = list(merge(self.inorder(), keys))
+        self.root = self._build(keys)
+
+    def _build(self, keys):
+        '''
+        Сборка сбалансированного дерева из отсортированного списка.
+        Глубина рекурсии - log n, поэтому стек не переполняется.
+        '''
+        def build(lo, hi):
+            if lo >= hi:
+                return None
+            mid = (lo + hi) // 2
+            node = Node(keys[mid])
+            node.l = build(lo, mid)
+            node.r = build(mid + 1, hi)
+            self._update(node)
+            return node
+
+        return build(0, len(keys))
+
+    # Снимок дерева на диске
+    def save(self, path):
+        '''
+        Сохранение дерева в двоичный снимок.
+        Формат: заголовок SNAPSHOT_HEADER (сигнатура, тип ключей 'q' - int64
+        или 'd' - float64, режим балансировки, число ключей), затем ключи
+        по возрастанию в little-endian. Форма дерева не хранится: при
+        загрузке строится идеально сбалансированное дерево.
+        Поддерживаются только числовые ключи.
+        '''
+        keys = self._snapshotKeys()
+        mode = b'a' if self.balanced == "avl" else b'-'
+        if sys.byteorder != 'little':
+            keys.byteswap()
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, keys.typecode.encode(),
+                                         mode, len(keys)))
+            keys.tofile(f)
+
+    def _snapshotKeys(self):
+        '''
+        Ключи дерева по возрастанию в виде array('q') или array('d')
+        '''
+        keys = list(self.inorder())
+        try:
+            return array('q', keys)
+        except OverflowError:
+            raise ValueError("Целый ключ не помещается в int64") from None
+        except TypeError:
+            pass
+        try:
+            return array('d', keys)
+        except TypeError:
+            raise TypeError("В снимок можно сохранить только числовые ключи") from None
+
+    @classmethod
+    def load(cls, path, readonly=False, storage=None):
+        '''
+        Загрузка дерева из снимка, записанного save.
+        При readonly=True файл не читается целиком, а отображается
+        в память: возвращается MappedTree, который отвечает на запросы
+        прямо по отображению, и несколько процессов делят одни страницы.
+        '''
+        if readonly:
+            return MappedTree(path)
+        with open(path, 'rb') as f:
+            typecode, balanced, count = _readSnapshotHeader(f)
+            keys = array(typecode)
+            keys.fromfile(f, count)
+        if sys.byteorder != 'little':
+            keys.byteswap()
+        return cls.from_iterable(keys, presorted=True, balanced=balanced,
+                                 storage=storage)
 
     def getRoot(self):
         '''
@@ -40,47 +203,175 @@ class Tree:
 
     def _add(self, val, node):
         '''
-        Вспомогательная рекурсивная функция добавления.
-        Если элемент меньше значения текущего узла,
-        добавляем его в левое поддерево.
-        В противном случае добавляем его в правое поддерево.
+        Вспомогательная функция добавления (без рекурсии).
+        Спускаемся от узла node: если элемент меньше значения текущего узла,
+        идем в левое поддерево, иначе в правое, запоминая пройденный путь.
+        После вставки пересчитываем узлы пути снизу вверх.
         '''
-        if val < node.v:
-            if node.l is not None:
-                self._add(val, node.l)
-            else:
-                node.l = Node(val)
+        path = []
+        while node is not None:
+            path.append(node)
+            node = node.l if val < node.v else node.r
+        path = self._ownPath(path)
+        parent = path[-1]
+        if val < parent.v:
+            parent.l = Node(val)
         else:
-            if node.r is not None:
-                self._add(val, node.r)
+            parent.r = Node(val)
+        self._fixPath(path)
+
+    def delete(self, val):
+        '''
+        Удаление узла с ключом val.
+        Возвращает True, если узел был найден и удален, иначе False.
+        Если у узла два потомка, заменяем его ключ минимальным ключом
+        правого поддерева и удаляем узел с этим минимумом.
+        В режиме AVL после удаления дерево балансируется.
+        '''
+        path = []
+        node = self.root
+        while node is not None and val != node.v:
+            path.append(node)
+            node = node.l if val < node.v else node.r
+        if node is None:
+            return False
+
+        target = None
+        if node.l is not None and node.r is not None:
+            path.append(node)
+            target = len(path) - 1
+            successor = node.r
+            while successor.l is not None:
+                path.append(successor)
+                successor = successor.l
+        path = self._ownPath(path)
+        if target is not None:
+            path[target].v = successor.v
+            node = successor
+
+        # У удаляемого узла теперь не больше одного потомка
+        child = node.l if node.l is not None else node.r
+        if not path:
+            self.root = child
+        elif path[-1].l is node:
+            path[-1].l = child
+        else:
+            path[-1].r = child
+        self._fixPath(path)
+        return True
+
+    def _ownPath(self, path):
+        '''
+        Подготовка пути от корня к изменению. Обычное дерево меняет узлы
+        на месте; ConcurrentTree здесь подменяет путь копиями.
+        '''
+        return path
+
+    def _fixPath(self, path):
+        '''
+        Пересчет агрегатов узлов пути от листа к корню,
+        в режиме AVL - с балансировкой.
+        Если поворот меняет корень поддерева, перевешиваем его на родителя.
+        '''
+        if not self.balanced:
+            for i in range(len(path) - 1, -1, -1):
+                self._update(path[i])
+            return
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            top = self._rebalance(node)
+            if top is node:
+                continue
+            if i == 0:
+                self.root = top
+            elif path[i - 1].l is node:
+                path[i - 1].l = top
+            else:
+                path[i - 1].r = top
+
+    @staticmethod
+    def _nodeHeight(node):
+        '''
+        Высота поддерева (0 для пустого)
+        '''
+        return node.h if node is not None else 0
+
+    @staticmethod
+    def _update(node):
+        '''
+        Пересчет высоты, размера и числа листьев узла по его потомкам
+        '''
+        l, r = node.l, node.r
+        if l is None:
+            if r is None:
+                node.h = node.s = node.lc = 1
             else:
-                node.r = Node(val)
+                node.h, node.s, node.lc = r.h + 1, r.s + 1, r.lc
+        elif r is None:
+            node.h, node.s, node.lc = l.h + 1, l.s + 1, l.lc
+        else:
+            node.h = (l.h if l.h > r.h else r.h) + 1
+            node.s = l.s + r.s + 1
+            node.lc = l.lc + r.lc
+
+    def _rotateLeft(self, node):
+        '''
+        Левый поворот вокруг узла, возвращает новый корень поддерева
+        '''
+        pivot = node.r
+        node.r = pivot.l
+        pivot.l = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotateRight(self, node):
+        '''
+        Правый поворот вокруг узла, возвращает новый корень поддерева
+        '''
+        pivot = node.l
+        node.l = pivot.r
+        pivot.r = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rebalance(self, node):
+        '''
+        Восстановление AVL-инварианта в узле:
+        разница высот поддеревьев не должна превышать 1.
+        '''
+        self._update(node)
+        balance = self._nodeHeight(node.l) - self._nodeHeight(node.r)
+        if balance > 1:
+            if self._nodeHeight(node.l.l) < self._nodeHeight(node.l.r):
+                node.l = self._rotateLeft(node.l)
+            return self._rotateRight(node)
+        if balance < -1:
+            if self._nodeHeight(node.r.r) < self._nodeHeight(node.r.l):
+                node.r = self._rotateRight(node.r)
+            return self._rotateLeft(node)
+        return node
 
     def find(self, val):
         '''
         Поиск узла.
-        Если узел не пуст, вызываем вспомогательную функцию поиска,
-        иначе возвращаем None.
+        Вызываем вспомогательную функцию поиска от корня,
+        для пустого дерева она сразу возвращает None.
         '''
-        if self.root is not None:
-            return self._find(val, self.root)
-        else:
-            return None
+        return self._find(val, self.root)
 
     def _find(self, val, node):
         '''
-        Вспомогательная рекурсивная функция поиска.
-        Если узел найден, возвращаем его. Если значение узла больше искомого,
-        продолжаем поиск в левом поддереве, если оно не пустое. Если значение
-        узла меньше искомого, продолжаем поиск в правом поддереве,
-        если оно не пустое.
+        Вспомогательная функция поиска (цикл вместо рекурсии).
+        Если узел найден, возвращаем его значение. Если значение узла больше
+        искомого, продолжаем поиск в левом поддереве, иначе в правом.
         '''
-        if val == node.v:
-            return node.v
-        elif (val < node.v and node.l != None):
-            return self._find(val, node.l)
-        elif (val > node.v and node.r != None):
-            return self._find(val, node.r)
+        while node is not None:
+            if val == node.v:
+                return node.v
+            node = node.l if val < node.v else node.r
+        return None
 
     def deleteTree(self):
         '''
@@ -89,44 +380,161 @@ class Tree:
         '''
         self.root = None
 
-    def printTree(self):
+    def printTree(self, out=None):
         '''
-        Печать дерева.
+        Печать дерева в out (по умолчанию sys.stdout).
         Вызываем вспомогательную функцию печати.
         '''
-        if self.root is not None:
-            print("Дерево:")
-            self._printTree(self.root)
-            print()
+        out = sys.stdout if out is None else out
+        if self.countNodes():
+            out.write("Дерево:\n")
+            self._printTree(self.root, out)
         else:
-            print("Дерево не существует")
+            out.write("Дерево не существует\n")
 
-    def _printTree(self, node):
+    def _printTree(self, node, out):
         '''
-        Вспомогательная рекурсивная функция печати.
+        Вспомогательная функция печати (прямой обход без рекурсии).
         '''
-        if node is not None:
-            print(str(node.v), end=' ')
-            self._printTree(node.l)
-            self._printTree(node.r)
+        self._writeKeys(self._keysOf(self._preorderNodes(node)), out)
 
-    def BFS(self):
+    def BFS(self, out=None):
         '''
-        Обход дерева в ширину.
+        Обход дерева в ширину с выводом в out (по умолчанию sys.stdout).
         '''
-        if self.root is not None:
-            q = Queue()
-            q.put(self.root)
-            while not q.empty():
-                x = q.get()
-                print(str(x.v), end=' ')
-                if x.l is not None:
-                     q.put(x.l)
-                if x.r is not None:
-                     q.put(x.r)
-            print()
+        out = sys.stdout if out is None else out
+        if self.countNodes():
+            self._writeKeys(self.level_order(), out)
         else:
-            print("Дерево не существует")
+            out.write("Дерево не существует\n")
+
+    @classmethod
+    def _writeKeys(cls, keys, out):
+        '''
+        Запись ключей через пробел с переводом строки в конце.
+        Ключи склеиваются в блоки по WRITE_BLOCK штук, и каждый блок
+        пишется одним вызовом write, а не print на каждый ключ.
+        '''
+        keys = iter(keys)
+        while True:
+            block = [str(v) for v in islice(keys, cls.WRITE_BLOCK)]
+            if not block:
+                break
+            block.append('')
+            out.write(' '.join(block))
+        out.write('\n')
+
+    # Итераторы обхода: выдают ключи по одному, ничего не печатая
+    def preorder(self):
+        '''
+        Прямой обход (корень, левое, правое поддерево)
+        '''
+        return self._keysOf(self._preorderNodes(self.root))
+
+    def inorder(self):
+        '''
+        Симметричный обход: ключи в порядке возрастания
+        '''
+        return self._keysOf(self._inorderNodes(self.root))
+
+    def postorder(self):
+        '''
+        Обратный обход (левое, правое поддерево, корень)
+        '''
+        return self._keysOf(self._postorderNodes(self.root))
+
+    def level_order(self):
+        '''
+        Обход в ширину по уровням
+        '''
+        return self._keysOf(self._levelOrderNodes(self.root))
+
+    @staticmethod
+    def _keysOf(nodes):
+        '''
+        Ленивое преобразование последовательности узлов в их ключи
+        '''
+        return (node.v for node in nodes)
+
+    @staticmethod
+    def _key(node):
+        '''
+        Ключ узла
+        '''
+        return node.v
+
+    @staticmethod
+    def _children(node):
+        '''
+        Пара (левый, правый) потомков узла
+        '''
+        return node.l, node.r
+
+    @staticmethod
+    def _preorderNodes(node):
+        '''
+        Прямой обход узлов с явным стеком
+        '''
+        if node is None:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            # Сначала кладем правого потомка, чтобы левый обрабатывался первым
+            if node.r is not None:
+                stack.append(node.r)
+            if node.l is not None:
+                stack.append(node.l)
+
+    @staticmethod
+    def _inorderNodes(node):
+        '''
+        Симметричный обход узлов с явным стеком
+        '''
+        stack = []
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.l
+            node = stack.pop()
+            yield node
+            node = node.r
+
+    @staticmethod
+    def _postorderNodes(node):
+        '''
+        Обратный обход узлов с явным стеком.
+        Узел выдается, когда его правое поддерево уже обработано.
+        '''
+        stack = []
+        last = None
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.l
+            top = stack[-1]
+            if top.r is not None and top.r is not last:
+                node = top.r
+            else:
+                last = stack.pop()
+                yield last
+
+    @staticmethod
+    def _levelOrderNodes(node):
+        '''
+        Обход узлов в ширину с очередью
+        '''
+        if node is None:
+            return
+        q = deque([node])
+        while q:
+            node = q.popleft()
+            yield node
+            if node.l is not None:
+                q.append(node.l)
+            if node.r is not None:
+                q.append(node.r)
 
     # Задача 2: Метод для вычисления количества узлов
     def countNodes(self):
@@ -137,11 +545,9 @@ class Tree:
 
     def _countNodes(self, node):
         '''
-        Вспомогательная рекурсивная функция для подсчета узлов
+        Количество узлов поддерева хранится в самом узле
         '''
-        if node is None:
-            return 0
-        return 1 + self._countNodes(node.l) + self._countNodes(node.r)
+        return node.s if node is not None else 0
 
     # Задача 3: Метод для вычисления количества листьев
     def countLeaves(self):
@@ -152,13 +558,9 @@ class Tree:
 
     def _countLeaves(self, node):
         '''
-        Вспомогательная рекурсивная функция для подсчета листьев
+        Количество листьев поддерева хранится в самом узле
         '''
-        if node is None:
-            return 0
-        if node.l is None and node.r is None:
-            return 1
-        return self._countLeaves(node.l) + self._countLeaves(node.r)
+        return node.lc if node is not None else 0
 
     # Задача 4: Метод для вычисления высоты дерева
     def height(self):
@@ -169,95 +571,961 @@ class Tree:
 
     def _height(self, node):
         '''
-        Вспомогательная рекурсивная функция для вычисления высоты
+        Высота поддерева хранится в самом узле
         '''
-        if node is None:
-            return 0
-        left_height = self._height(node.l)
-        right_height = self._height(node.r)
-        return max(left_height, right_height) + 1
+        return self._nodeHeight(node)
+
+    # Порядковая статистика
+    def rank(self, val):
+        '''
+        Возвращает количество ключей, строго меньших val
+        '''
+        node = self.root
+        result = 0
+        while node is not None:
+            if val <= node.v:
+                node = node.l
+            else:
+                result += (node.l.s if node.l is not None else 0) + 1
+                node = node.r
+        return result
+
+    def select(self, k):
+        '''
+        Возвращает k-й по возрастанию ключ (нумерация с 0).
+        Отрицательный k считается с конца, как в списках.
+        '''
+        node = self.root
+        size = self._countNodes(node)
+        if k < 0:
+            k += size
+        if not 0 <= k < size:
+            raise IndexError("Индекс вне дерева: %d" % k)
+        while True:
+            left = node.l.s if node.l is not None else 0
+            if k < left:
+                node = node.l
+            elif k == left:
+                return node.v
+            else:
+                k -= left + 1
+                node = node.r
+
+    # Запросы по диапазону ключей
+    def range(self, lo=None, hi=None):
+        '''
+        Ленивый обход ключей из полуинтервала [lo, hi) по возрастанию.
+        None вместо границы означает отсутствие ограничения.
+        Поддеревья вне диапазона не посещаются: O(log n + k).
+        '''
+        return self._keysOf(self._rangeNodes(self.root, lo, hi))
+
+    def _rangeNodes(self, node, lo, hi):
+        '''
+        Симметричный обход узлов с ключами из [lo, hi).
+        В стек попадают только узлы с ключом не меньше lo,
+        обход прекращается на первом ключе не меньше hi.
+        '''
+        stack = []
+        while True:
+            while node is not None:
+                if lo is not None and node.v < lo:
+                    node = node.r
+                else:
+                    stack.append(node)
+                    node = node.l
+            if not stack:
+                return
+            node = stack.pop()
+            if hi is not None and node.v >= hi:
+                return
+            yield node
+            node = node.r
+
+    def count_range(self, lo=None, hi=None):
+        '''
+        Количество ключей в полуинтервале [lo, hi) за O(log n)
+        '''
+        upper = self.countNodes() if hi is None else self.rank(hi)
+        lower = 0 if lo is None else self.rank(lo)
+        return max(upper - lower, 0)
+
+    def floor(self, x):
+        '''
+        Наибольший ключ, не превосходящий x (None, если такого нет)
+        '''
+        nil = self._nil
+        node = self.root
+        best = None
+        while node != nil:
+            key = self._key(node)
+            if key == x:
+                return key
+            left, right = self._children(node)
+            if key < x:
+                best = key
+                node = right
+            else:
+                node = left
+        return best
+
+    def ceiling(self, x):
+        '''
+        Наименьший ключ, не меньший x (None, если такого нет)
+        '''
+        nil = self._nil
+        node = self.root
+        best = None
+        while node != nil:
+            key = self._key(node)
+            if key == x:
+                return key
+            left, right = self._children(node)
+            if key > x:
+                best = key
+                node = left
+            else:
+                node = right
+        return best
+
+    def min(self):
+        '''
+        Минимальный ключ (None для пустого дерева)
+        '''
+        return self.select(0) if self.countNodes() else None
+
+    def max(self):
+        '''
+        Максимальный ключ (None для пустого дерева)
+        '''
+        return self.select(-1) if self.countNodes() else None
 
     # Задача 5: Метод обхода в глубину с использованием стека
-    def DFS(self):
+    def DFS(self, out=None):
         '''
-        Обход дерева в глубину с использованием стека
+        Обход дерева в глубину с использованием стека,
+        вывод в out (по умолчанию sys.stdout)
         '''
-        if self.root is None:
-            print("Дерево не существует")
+        out = sys.stdout if out is None else out
+        if not self.countNodes():
+            out.write("Дерево не существует\n")
+            return
+
+        # Прямой обход со стеком - см. _preorderNodes
+        self._writeKeys(self.preorder(), out)
+
+    # Задача 6*: Красивый вывод дерева
+    def prettyPrint(self, out=None, max_levels=PRETTY_LEVELS, width=None):
+        '''
+        Красивый вывод дерева в виде древовидной структуры
+        в out (по умолчанию sys.stdout), одной записью.
+        Параметры ограничения - как у prettyLines.
+        '''
+        out = sys.stdout if out is None else out
+        if not self.countNodes():
+            out.write("Дерево не существует\n")
+            return
+        out.write('\n'.join(self.prettyLines(max_levels, width)) + '\n')
+
+    def prettyLines(self, max_levels=PRETTY_LEVELS, width=None):
+        '''
+        Строки красивого вывода дерева, по одной на уровень.
+        Уровень i делится на 2**i ячеек равной ширины, ключ центрируется
+        в своей ячейке, поэтому ширина строки растет как 2**уровней.
+        Выводится не больше max_levels верхних уровней (None - все,
+        что для глубоких деревьев дает экспоненциальную ширину),
+        а при заданном width - только уровни, помещающиеся в width символов.
+        Об отброшенных уровнях сообщает последняя строка; для пустого
+        дерева список пуст.
+        Память и время - O(2**выведенных уровней), а не O(n).
+        '''
+        height = self.height()
+        shown = height if max_levels is None else min(height, max_levels)
+        if width is not None:
+            # Ячейка не уже двух символов - отсекаем уровни до сбора ключей
+            while shown > 1 and 2 << (shown - 1) > width:
+                shown -= 1
+        nil = self._nil
+
+        # Собираем верхние уровни как полное двоичное дерево с пропусками
+        levels = []
+        level = [self.root]
+        for _ in range(shown):
+            levels.append([str(self._key(node)) if node != nil else ""
+                           for node in level])
+            below = []
+            for node in level:
+                below.extend(self._children(node) if node != nil else (nil, nil))
+            level = below
+
+        cell = max((len(key) for row in levels for key in row), default=0) + 1
+        if width is not None:
+            while shown > 1 and cell << (shown - 1) > width:
+                shown -= 1
+
+        lines = []
+        for i in range(shown):
+            span = cell << (shown - 1 - i)
+            lines.append(''.join(key.center(span) for key in levels[i]).rstrip())
+        if shown < height:
+            lines.append("... еще уровней: %d" % (height - shown))
+        return lines
+
+class ArrayTree(Tree):
+    '''
+    Бинарное дерево поиска с компактным хранением узлов (struct-of-arrays).
+    Узел - это индекс в параллельных массивах array: ключи, индексы левого
+    и правого потомков (-1 - потомка нет), высоты, размеры и числа листьев
+    поддеревьев. Это около 44 байт на ключ против сотен байт на объект
+    Node, а соседние узлы лежат в памяти подряд.
+    Ключи - целые числа, помещающиеся в int64.
+    Создается через Tree(storage="array"), интерфейс тот же, что у Tree;
+    getRoot возвращает индекс корня.
+    '''
+    _nil = -1
+
+    def __init__(self, balanced=None, storage="array"):
+        '''
+        Создаем пустое дерево
+        '''
+        if storage != "array":
+            raise ValueError("ArrayTree поддерживает только storage='array'")
+        super().__init__(balanced=balanced, storage=storage)
+        self._clear()
+
+    def _clear(self):
+        '''
+        Сброс хранилища узлов
+        '''
+        self.root = -1
+        self._keys = array('q')   # Ключи
+        self._left = array('q')   # Индексы левых потомков
+        self._right = array('q')  # Индексы правых потомков
+        self._h = array('i')      # Высоты поддеревьев
+        self._s = array('q')      # Размеры поддеревьев
+        self._lc = array('q')     # Числа листьев поддеревьев
+        self._free = array('q')   # Освободившиеся после удаления индексы
+
+    def _alloc(self, val):
+        '''
+        Выделение ячейки под новый лист, возвращает его индекс
+        '''
+        if self._free:
+            i = self._free.pop()
+            self._keys[i] = val
+            self._left[i] = self._right[i] = -1
+            self._h[i] = self._s[i] = self._lc[i] = 1
+            return i
+        self._keys.append(val)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._h.append(1)
+        self._s.append(1)
+        self._lc.append(1)
+        return len(self._keys) - 1
+
+    def _build(self, keys):
+        '''
+        Сборка сбалансированного дерева из отсортированного списка.
+        Хранилище заполняется заново: i-й ключ попадает в ячейку i.
+        '''
+        n = len(keys)
+        self._clear()
+        self._keys = array('q', keys)
+        left = self._left = array('q', [-1]) * n
+        right = self._right = array('q', [-1]) * n
+        self._h = array('i', [1]) * n
+        self._s = array('q', [1]) * n
+        self._lc = array('q', [1]) * n
+
+        def build(lo, hi):
+            if lo >= hi:
+                return -1
+            mid = (lo + hi) // 2
+            left[mid] = build(lo, mid)
+            right[mid] = build(mid + 1, hi)
+            self._update(mid)
+            return mid
+
+        return build(0, n)
+
+    def getRoot(self):
+        '''
+        Получение индекса корня (None для пустого дерева)
+        '''
+        return self.root if self.root != -1 else None
+
+    def add(self, val):
+        '''
+        Добавление узла
+        '''
+        if self.root == -1:
+            self.root = self._alloc(val)
+        else:
+            self._add(val, self.root)
+
+    def _add(self, val, node):
+        '''
+        Вспомогательная функция добавления, см. Tree._add
+        '''
+        keys, left, right = self._keys, self._left, self._right
+        path = []
+        while node != -1:
+            path.append(node)
+            node = left[node] if val < keys[node] else right[node]
+        parent = path[-1]
+        new = self._alloc(val)
+        if val < keys[parent]:
+            left[parent] = new
+        else:
+            right[parent] = new
+        self._fixPath(path)
+
+    def delete(self, val):
+        '''
+        Удаление узла с ключом val, см. Tree.delete.
+        Освободившаяся ячейка используется повторно при следующей вставке.
+        '''
+        keys, left, right = self._keys, self._left, self._right
+        path = []
+        node = self.root
+        while node != -1 and val != keys[node]:
+            path.append(node)
+            node = left[node] if val < keys[node] else right[node]
+        if node == -1:
+            return False
+
+        if left[node] != -1 and right[node] != -1:
+            path.append(node)
+            successor = right[node]
+            while left[successor] != -1:
+                path.append(successor)
+                successor = left[successor]
+            keys[node] = keys[successor]
+            node = successor
+
+        child = left[node] if left[node] != -1 else right[node]
+        if not path:
+            self.root = child
+        elif left[path[-1]] == node:
+            left[path[-1]] = child
+        else:
+            right[path[-1]] = child
+        self._free.append(node)
+        self._fixPath(path)
+        return True
+
+    def deleteTree(self):
+        '''
+        Удаление дерева вместе с хранилищем узлов
+        '''
+        self._clear()
+
+    def _fixPath(self, path):
+        '''
+        Пересчет агрегатов и балансировка узлов пути, см. Tree._fixPath
+        '''
+        if not self.balanced:
+            for i in range(len(path) - 1, -1, -1):
+                self._update(path[i])
             return
+        left, right = self._left, self._right
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            top = self._rebalance(node)
+            if top == node:
+                continue
+            if i == 0:
+                self.root = top
+            elif left[path[i - 1]] == node:
+                left[path[i - 1]] = top
+            else:
+                right[path[i - 1]] = top
+
+    def _nodeHeight(self, node):
+        '''
+        Высота поддерева (0 для пустого)
+        '''
+        return self._h[node] if node != -1 else 0
+
+    def _update(self, node):
+        '''
+        Пересчет высоты, размера и числа листьев узла по его потомкам
+        '''
+        h, s, lc = self._h, self._s, self._lc
+        l, r = self._left[node], self._right[node]
+        if l == -1:
+            if r == -1:
+                h[node] = s[node] = lc[node] = 1
+            else:
+                h[node], s[node], lc[node] = h[r] + 1, s[r] + 1, lc[r]
+        elif r == -1:
+            h[node], s[node], lc[node] = h[l] + 1, s[l] + 1, lc[l]
+        else:
+            h[node] = (h[l] if h[l] > h[r] else h[r]) + 1
+            s[node] = s[l] + s[r] + 1
+            lc[node] = lc[l] + lc[r]
+
+    def _rotateLeft(self, node):
+        '''
+        Левый поворот вокруг узла, возвращает новый корень поддерева
+        '''
+        left, right = self._left, self._right
+        pivot = right[node]
+        right[node] = left[pivot]
+        left[pivot] = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rotateRight(self, node):
+        '''
+        Правый поворот вокруг узла, возвращает новый корень поддерева
+        '''
+        left, right = self._left, self._right
+        pivot = left[node]
+        left[node] = right[pivot]
+        right[pivot] = node
+        self._update(node)
+        self._update(pivot)
+        return pivot
+
+    def _rebalance(self, node):
+        '''
+        Восстановление AVL-инварианта в узле
+        '''
+        left, right, height = self._left, self._right, self._nodeHeight
+        self._update(node)
+        l, r = left[node], right[node]
+        balance = height(l) - height(r)
+        if balance > 1:
+            if height(left[l]) < height(right[l]):
+                left[node] = self._rotateLeft(l)
+            return self._rotateRight(node)
+        if balance < -1:
+            if height(right[r]) < height(left[r]):
+                right[node] = self._rotateRight(r)
+            return self._rotateLeft(node)
+        return node
+
+    def _find(self, val, node):
+        '''
+        Вспомогательная функция поиска, см. Tree._find
+        '''
+        keys, left, right = self._keys, self._left, self._right
+        while node != -1:
+            key = keys[node]
+            if val == key:
+                return key
+            node = left[node] if val < key else right[node]
+        return None
+
+    def _countNodes(self, node):
+        '''
+        Количество узлов поддерева
+        '''
+        return self._s[node] if node != -1 else 0
+
+    def _countLeaves(self, node):
+        '''
+        Количество листьев поддерева
+        '''
+        return self._lc[node] if node != -1 else 0
+
+    def rank(self, val):
+        '''
+        Возвращает количество ключей, строго меньших val
+        '''
+        keys, left, right, s = self._keys, self._left, self._right, self._s
+        node = self.root
+        result = 0
+        while node != -1:
+            if val <= keys[node]:
+                node = left[node]
+            else:
+                l = left[node]
+                result += (s[l] if l != -1 else 0) + 1
+                node = right[node]
+        return result
+
+    def select(self, k):
+        '''
+        Возвращает k-й по возрастанию ключ (нумерация с 0)
+        '''
+        size = self._countNodes(self.root)
+        if k < 0:
+            k += size
+        if not 0 <= k < size:
+            raise IndexError("Индекс вне дерева: %d" % k)
+        keys, left, right, s = self._keys, self._left, self._right, self._s
+        node = self.root
+        while True:
+            l = left[node]
+            count = s[l] if l != -1 else 0
+            if k < count:
+                node = l
+            elif k == count:
+                return keys[node]
+            else:
+                k -= count + 1
+                node = right[node]
 
+    def _rangeNodes(self, node, lo, hi):
+        '''
+        Симметричный обход индексов узлов с ключами из [lo, hi),
+        см. Tree._rangeNodes
+        '''
+        keys, left, right = self._keys, self._left, self._right
         stack = []
-        stack.append(self.root)
+        while True:
+            while node != -1:
+                if lo is not None and keys[node] < lo:
+                    node = right[node]
+                else:
+                    stack.append(node)
+                    node = left[node]
+            if not stack:
+                return
+            node = stack.pop()
+            if hi is not None and keys[node] >= hi:
+                return
+            yield node
+            node = right[node]
+
+    def _keysOf(self, nodes):
+        '''
+        Ленивое преобразование индексов узлов в ключи
+        '''
+        return map(self._keys.__getitem__, nodes)
+
+    def _key(self, node):
+        '''
+        Ключ узла
+        '''
+        return self._keys[node]
+
+    def _children(self, node):
+        '''
+        Пара (левый, правый) потомков узла
+        '''
+        return self._left[node], self._right[node]
 
+    def _preorderNodes(self, node):
+        '''
+        Прямой обход индексов узлов с явным стеком
+        '''
+        if node == -1:
+            return
+        left, right = self._left, self._right
+        stack = [node]
         while stack:
             node = stack.pop()
-            print(str(node.v), end=' ')
+            yield node
+            if right[node] != -1:
+                stack.append(right[node])
+            if left[node] != -1:
+                stack.append(left[node])
 
-            # Сначала добавляем правый потомок, чтобы левый обрабатывался первым
-            if node.r is not None:
-                stack.append(node.r)
-            if node.l is not None:
-                stack.append(node.l)
-        print()
+    def _inorderNodes(self, node):
+        '''
+        Симметричный обход индексов узлов с явным стеком
+        '''
+        left, right = self._left, self._right
+        stack = []
+        while stack or node != -1:
+            while node != -1:
+                stack.append(node)
+                node = left[node]
+            node = stack.pop()
+            yield node
+            node = right[node]
 
-    # Задача 6*: Красивый вывод дерева
-    def prettyPrint(self):
+    def _postorderNodes(self, node):
         '''
-        Красивый вывод дерева в виде древовидной структуры
+        Обратный обход индексов узлов с явным стеком
         '''
-        if self.root is None:
-            print("Дерево не существует")
+        left, right = self._left, self._right
+        stack = []
+        last = -1
+        while stack or node != -1:
+            while node != -1:
+                stack.append(node)
+                node = left[node]
+            top = stack[-1]
+            if right[top] != -1 and right[top] != last:
+                node = right[top]
+            else:
+                last = stack.pop()
+                yield last
+
+    def _levelOrderNodes(self, node):
+        '''
+        Обход индексов узлов в ширину с очередью
+        '''
+        if node == -1:
             return
+        left, right = self._left, self._right
+        q = deque([node])
+        while q:
+            node = q.popleft()
+            yield node
+            if left[node] != -1:
+                q.append(left[node])
+            if right[node] != -1:
+                q.append(right[node])
 
-        levels = []
-        q = Queue()
-        q.put((self.root, 0))
 
-        # Собираем узлы по уровням
-        while not q.empty():
-            node, level = q.get()
+class ConcurrentTree(Tree):
+    '''
+    Дерево для одного писателя и многих читателей из разных потоков.
+    Узлы персистентные: запись не меняет опубликованные узлы, а копирует
+    путь от корня до места изменения (и узлы, задетые поворотами),
+    после чего новый корень публикуется одним присваиванием self.root.
+    Читатели не берут блокировок: каждый запрос и каждый обход работает
+    с корнем, прочитанным в начале, то есть с согласованным снимком.
+    Писатели упорядочиваются обычной блокировкой.
+    Для серии запросов к одному состоянию используйте snapshot().
+    '''
+    def __init__(self, balanced=None, storage="object"):
+        '''
+        Создаем пустое дерево
+        '''
+        if storage != "object":
+            raise ValueError("ConcurrentTree поддерживает только storage='object'")
+        super().__init__(balanced=balanced, storage=storage)
+        self._lock = threading.Lock()
 
-            if level == len(levels):
-                levels.append([])
+    def _draft(self):
+        '''
+        Черновик для одной записи: видит текущий корень, но меняет
+        только копии узлов
+        '''
+        draft = _PathCopyTree(balanced=self.balanced)
+        draft.root = self.root
+        return draft
+
+    def add(self, val):
+        '''
+        Добавление узла с публикацией нового корня
+        '''
+        with self._lock:
+            draft = self._draft()
+            draft.add(val)
+            self.root = draft.root
+
+    def delete(self, val):
+        '''
+        Удаление узла с публикацией нового корня
+        '''
+        with self._lock:
+            draft = self._draft()
+            removed = draft.delete(val)
+            self.root = draft.root
+        return removed
 
-            levels[level].append(str(node.v) if node else " ")
+    def extend(self, keys):
+        '''
+        Пакетное добавление ключей, публикуется одним корнем
+        '''
+        with self._lock:
+            draft = self._draft()
+            draft.extend(keys)
+            self.root = draft.root
 
-            if node:
-                q.put((node.l, level + 1))
-                q.put((node.r, level + 1))
+    def deleteTree(self):
+        '''
+        Удаление дерева
+        '''
+        with self._lock:
+            self.root = None
+
+    def snapshot(self):
+        '''
+        Неизменяемый снимок текущего состояния в виде обычного Tree.
+        Снимок делит узлы с деревом и создается за O(1); менять его нельзя,
+        иначе изменения попадут в общие узлы.
+        '''
+        snap = Tree(balanced=self.balanced)
+        snap.root = self.root
+        return snap
+
+    # Составные запросы базового класса читают self.root несколько раз
+    # (сначала размер, потом обход), поэтому выполняются на одном снимке
+    def min(self):
+        '''
+        Минимальный ключ одного снимка
+        '''
+        return self.snapshot().min()
+
+    def max(self):
+        '''
+        Максимальный ключ одного снимка
+        '''
+        return self.snapshot().max()
+
+    def count_range(self, lo=None, hi=None):
+        '''
+        Количество ключей в [lo, hi) по одному снимку
+        '''
+        return self.snapshot().count_range(lo, hi)
+
+    def printTree(self, out=None):
+        '''
+        Печать одного снимка дерева
+        '''
+        self.snapshot().printTree(out)
+
+    def BFS(self, out=None):
+        '''
+        Обход в ширину одного снимка дерева
+        '''
+        self.snapshot().BFS(out)
+
+    def DFS(self, out=None):
+        '''
+        Обход в глубину одного снимка дерева
+        '''
+        self.snapshot().DFS(out)
+
+    def prettyPrint(self, out=None, max_levels=Tree.PRETTY_LEVELS, width=None):
+        '''
+        Красивый вывод одного снимка дерева
+        '''
+        self.snapshot().prettyPrint(out, max_levels, width)
+
+    def prettyLines(self, max_levels=Tree.PRETTY_LEVELS, width=None):
+        '''
+        Строки красивого вывода одного снимка дерева
+        '''
+        return self.snapshot().prettyLines(max_levels, width)
+
+
+class _PathCopyTree(Tree):
+    '''
+    Черновик записи ConcurrentTree: копирует узлы перед изменением
+    '''
+    def _ownPath(self, path):
+        '''
+        Копирование пути от корня и перевязка копий между собой
+        '''
+        copies = [node.copy() for node in path]
+        for i in range(len(path) - 1):
+            parent = copies[i]
+            if parent.l is path[i + 1]:
+                parent.l = copies[i + 1]
+            else:
+                parent.r = copies[i + 1]
+        if copies:
+            self.root = copies[0]
+        return copies
+
+    def _rotateLeft(self, node):
+        '''
+        Левый поворот над копиями узла и его правого потомка
+        '''
+        node = node.copy()
+        node.r = node.r.copy()
+        return super()._rotateLeft(node)
+
+    def _rotateRight(self, node):
+        '''
+        Правый поворот над копиями узла и его левого потомка
+        '''
+        node = node.copy()
+        node.l = node.l.copy()
+        return super()._rotateRight(node)
+
+
+class MappedTree:
+    '''
+    Дерево из снимка Tree.save, открытое только для чтения через mmap.
+    Ключи лежат в файле по возрастанию, поэтому неявное сбалансированное
+    дерево над ними - это двоичный поиск: find, rank, select, range и
+    остальные запросы работают за O(log n) прямо по отображению,
+    без чтения файла в память. Добавление и удаление не поддерживаются.
+    '''
+    def __init__(self, path):
+        '''
+        Открываем снимок и отображаем его в память
+        '''
+        if sys.byteorder != 'little':
+            raise ValueError("Отображение снимка поддерживается только на little-endian")
+        self._keys = None
+        self._file = open(path, 'rb')
+        try:
+            typecode, self.balanced, count = _readSnapshotHeader(self._file)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        start = SNAPSHOT_HEADER.size
+        end = start + count * array(typecode).itemsize
+        if len(self._map) < end:
+            self.close()
+            raise ValueError("Снимок обрезан: %s" % path)
+        self._keys = memoryview(self._map)[start:end].cast(typecode)
+
+    def close(self):
+        '''
+        Закрытие отображения и файла.
+        Незаконченные обходы range и inorder не держат буфер отображения,
+        а при следующем шаге получают ValueError.
+        '''
+        if self._map is not None:
+            if self._keys is not None:
+                self._keys.release()
+                self._keys = None
+            self._map.close()
+            self._map = None
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def countNodes(self):
+        '''
+        Количество ключей
+        '''
+        return len(self._keys)
+
+    def height(self):
+        '''
+        Высота неявного сбалансированного дерева
+        '''
+        return len(self._keys).bit_length()
+
+    def find(self, val):
+        '''
+        Поиск ключа, возвращает его или None
+        '''
+        keys = self._keys
+        i = bisect_left(keys, val)
+        if i < len(keys) and keys[i] == val:
+            return keys[i]
+        return None
+
+    def rank(self, val):
+        '''
+        Количество ключей, строго меньших val
+        '''
+        return bisect_left(self._keys, val)
+
+    def select(self, k):
+        '''
+        k-й по возрастанию ключ (нумерация с 0)
+        '''
+        try:
+            return self._keys[k]
+        except IndexError:
+            raise IndexError("Индекс вне дерева: %d" % k) from None
+
+    def _keyAt(self, i):
+        '''
+        i-й ключ по возрастанию; ValueError после close
+        '''
+        if self._keys is None:
+            raise ValueError("Снимок дерева закрыт")
+        return self._keys[i]
+
+    def _bounds(self, lo, hi):
+        '''
+        Позиции начала и конца полуинтервала [lo, hi) в массиве ключей
+        '''
+        keys = self._keys
+        start = 0 if lo is None else bisect_left(keys, lo)
+        stop = len(keys) if hi is None else bisect_left(keys, hi)
+        return start, max(start, stop)
+
+    def inorder(self):
+        '''
+        Ключи по возрастанию
+        '''
+        return self.range()
+
+    def range(self, lo=None, hi=None):
+        '''
+        Ленивый обход ключей из полуинтервала [lo, hi).
+        Ключи читаются по позиции через _keyAt, см. close.
+        '''
+        start, stop = self._bounds(lo, hi)
+        return (self._keyAt(i) for i in range(start, stop))
+
+    def count_range(self, lo=None, hi=None):
+        '''
+        Количество ключей в полуинтервале [lo, hi)
+        '''
+        start, stop = self._bounds(lo, hi)
+        return stop - start
+
+    def floor(self, x):
+        '''
+        Наибольший ключ, не превосходящий x (None, если такого нет)
+        '''
+        i = bisect_right(self._keys, x)
+        return self._keys[i - 1] if i else None
+
+    def ceiling(self, x):
+        '''
+        Наименьший ключ, не меньший x (None, если такого нет)
+        '''
+        i = bisect_left(self._keys, x)
+        return self._keys[i] if i < len(self._keys) else None
+
+    def min(self):
+        '''
+        Минимальный ключ (None для пустого снимка)
+        '''
+        return self._keys[0] if len(self._keys) else None
+
+    def max(self):
+        '''
+        Максимальный ключ (None для пустого снимка)
+        '''
+        return self._keys[-1] if len(self._keys) else None
+
+
+def _readSnapshotHeader(f):
+    '''
+    Чтение и проверка заголовка снимка.
+    Возвращает (тип ключей, режим балансировки, число ключей).
+    '''
+    raw = f.read(SNAPSHOT_HEADER.size)
+    if len(raw) != SNAPSHOT_HEADER.size:
+        raise ValueError("Файл слишком короткий для снимка дерева")
+    magic, typecode, mode, count = SNAPSHOT_HEADER.unpack(raw)
+    if magic != SNAPSHOT_MAGIC or typecode not in (b'q', b'd'):
+        raise ValueError("Файл не является снимком дерева")
+    return typecode.decode(), "avl" if mode == b'a' else None, count
 
-        # Удаляем пустые уровни (если есть)
-        levels = [level for level in levels if any(node != " " for node in level)]
 
-        # Выводим дерево
-        for i, level in enumerate(levels):
-            indent = " " * (2 ** (len(levels) - i - 1) - 1)
-            separator = " " * (2 ** (len(levels) - i) - 1)
-            print(indent + separator.join(level))
-trea = Tree()
-n = 10  # количество чисел
-min_val = 1
-max_val = 100
+if __name__ == '__main__':
+    trea = Tree()
+    n = 10  # количество чисел
+    min_val = 1
+    max_val = 100
 
-numbers = [random.randint(min_val, max_val) for _ in range(n)]
-print("Сгенерированные числа:", numbers)
+    numbers = [random.randint(min_val, max_val) for _ in range(n)]
+    print("Сгенерированные числа:", numbers)
 
-for num in numbers:
-    trea.add(num)
+    for num in numbers:
+        trea.add(num)
 
-# Задача 2: Количество узлов
-print("Количество узлов:", trea.countNodes())
+    # Задача 2: Количество узлов
+    print("Количество узлов:", trea.countNodes())
 
-# Задача 3: Количество листьев
-print("Количество листьев:", trea.countLeaves())
+    # Задача 3: Количество листьев
+    print("Количество листьев:", trea.countLeaves())
 
-# Задача 4: Высота дерева
-print("Высота дерева:", trea.height())
+    # Задача 4: Высота дерева
+    print("Высота дерева:", trea.height())
 
-# Задача 5: Обход в глубину
-print("Обход в глубину (DFS):", end=' ')
-trea.DFS()
+    # Задача 5: Обход в глубину
+    print("Обход в глубину (DFS):", end=' ')
+    trea.DFS()
 
-# Задача 6: Красивый вывод
-print("\nКрасивый вывод дерева:")
-trea.prettyPrint()
\ No newline at end of file
+    # Задача 6: Красивый вывод
+    print("\nКрасивый вывод дерева:")
+    trea.prettyPrint()
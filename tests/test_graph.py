@@ -0,0 +1,326 @@
+'''
+Проверки Graph (Laba4/main.py).
+
+Запуск из корня репозитория:
+    python -m pytest tests
+'''
+import csv
+import importlib.util
+import io
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name, path):
+    '''
+    Загрузка модуля по пути: в репозитории два файла main.py.
+    Модуль регистрируется в sys.modules, чтобы процессы-исполнители
+    могли найти его функции.
+    '''
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+graph_main = load_module("graph_main", os.path.join("Laba4", "main.py"))
+Graph = graph_main.Graph
+
+EDGES = [("a", "b", 1.0), ("b", "c", 2.0), ("c", "a", 3.0),
+         ("c", "d", 1.5), ("d", "d", 4.0), ("a", "b", 0.5)]
+
+
+def random_graph(rnd, directed, n, m):
+    '''
+    Случайный граф из m ребер на метках 0..n-1 с целыми весами
+    '''
+    graph = Graph(directed=directed)
+    for _ in range(m):
+        graph.add_edge(str(rnd.randrange(n)), str(rnd.randrange(n)),
+                       float(rnd.randint(1, 9)))
+    return graph
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def build(self, directed):
+        graph = Graph(directed=directed)
+        for edge in EDGES:
+            graph.add_edge(*edge)
+        graph.add_vertex("e")
+        return graph
+
+    def test_save_open_save_round_trip(self):
+        for directed in (False, True):
+            graph = self.build(directed)
+            graph.save_binary(self.path("first.bin"))
+            with Graph.open_binary(self.path("first.bin")) as mapped:
+                self.assertEqual(mapped.directed, directed)
+                self.assertEqual(mapped.get_vertex_labels(), graph.get_vertex_labels())
+                self.assertEqual(mapped.edges, graph.edges)
+                self.assertEqual(mapped.adjacency_matrix, graph.adjacency_matrix)
+                self.assertEqual(mapped.dijkstra("a"), graph.dijkstra("a"))
+                mapped.save_binary(self.path("second.bin"))
+            with open(self.path("first.bin"), 'rb') as a, open(self.path("second.bin"), 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_close_releases_mapping(self):
+        self.build(True).save_binary(self.path("graph.bin"))
+        mapped = Graph.open_binary(self.path("graph.bin"))
+        mapped.strongly_connected_components()
+        mapped.close()
+        self.assertIsNone(mapped._mapping)
+        self.assertEqual(mapped.edges, [])
+        mapped.close()
+
+    def test_mutation_detaches_mapping(self):
+        self.build(False).save_binary(self.path("graph.bin"))
+        mapped = Graph.open_binary(self.path("graph.bin"))
+        mapped.add_edge("x", "a", 2.0)
+        self.assertIsNone(mapped._mapping)
+        self.assertEqual(len(mapped.edges), len(EDGES) + 1)
+        self.assertEqual(mapped.shortest_path("x", "d"), (6.0, ["x", "a", "b", "c", "d"]))
+
+    def test_not_a_snapshot(self):
+        with open(self.path("edges.txt"), 'w') as f:
+            f.write("a b 1\n")
+        with self.assertRaises(ValueError):
+            Graph.open_binary(self.path("edges.txt"))
+
+
+class EulerTest(unittest.TestCase):
+    def test_cached_answer_follows_mutations(self):
+        graph = Graph()
+        for u, v in (("a", "b"), ("b", "c"), ("c", "a")):
+            graph.add_edge(u, v)
+        self.assertTrue(graph.has_eulerian_cycle())
+        self.assertTrue(graph.has_eulerian_cycle())
+        graph.add_edge("c", "d")
+        self.assertFalse(graph.has_eulerian_cycle())
+        graph.remove_edge("c", "d")
+        self.assertTrue(graph.has_eulerian_cycle())
+        graph.add_edge("d", "e")
+        graph.add_edge("e", "d")
+        self.assertFalse(graph.has_eulerian_cycle())
+        graph.remove_vertex("d")
+        self.assertTrue(graph.has_eulerian_cycle())
+
+    def test_circuit_start(self):
+        graph = Graph()
+        graph.add_vertex("a")
+        self.assertEqual(graph.eulerian_circuit("a"), ["a"])
+        with self.assertRaises(KeyError):
+            graph.eulerian_circuit("z")
+        for u, v in (("a", "b"), ("b", "c"), ("c", "a")):
+            graph.add_edge(u, v)
+        graph.add_vertex("d")
+        self.assertEqual(graph.eulerian_circuit("b"), ["b", "a", "c", "b"])
+        self.assertIsNone(graph.eulerian_circuit("d"))
+        with self.assertRaises(KeyError):
+            graph.eulerian_circuit("z")
+
+
+class ShortestPathTest(unittest.TestCase):
+    def test_unknown_labels(self):
+        graph = Graph()
+        graph.add_edge("a", "b", 1.0)
+        for method in ("dijkstra", "bidirectional"):
+            self.assertEqual(graph.shortest_path("z", "z", method), (float('inf'), None))
+            self.assertEqual(graph.shortest_path("a", "z", method), (float('inf'), None))
+            self.assertEqual(graph.shortest_path("a", "a", method), (0, ["a"]))
+        self.assertEqual(graph.shortest_path("z", "z", heuristic=lambda v: 0),
+                         (float('inf'), None))
+
+    def test_empty_graph(self):
+        graph = Graph()
+        self.assertEqual(graph.floyd_warshall(), [])
+        self.assertEqual(graph.floyd_warshall(next_hop=True), ([], []))
+        if graph_main.np is not None:
+            for block_size in (None, 2):
+                dist, nxt = graph.floyd_warshall_array(next_hop=True, block_size=block_size)
+                self.assertEqual((dist.shape, nxt.shape), ((0, 0), (0, 0)))
+
+
+class VertexOrderTest(unittest.TestCase):
+    def test_matrices_follow_sorted_labels(self):
+        graph = Graph()
+        for u, v, weight in (("d", "b", 1.0), ("b", "a", 2.0), ("c", "d", 3.0)):
+            graph.add_edge(u, v, weight)
+        labels = sorted(graph.vertices)
+        self.assertEqual(graph.get_vertex_labels(), labels)
+        index = {label: i for i, label in enumerate(labels)}
+        matrix = graph.adjacency_matrix
+        for u, v, weight in graph.edges:
+            self.assertEqual(matrix[index[u]][index[v]], weight)
+        self.assertEqual(graph.floyd_warshall()[index["a"]][index["c"]], 6.0)
+
+        # Новая вершина встает в построенную матрицу на свое место
+        graph.add_edge("a", "aa", 5.0)
+        labels = sorted(graph.vertices)
+        self.assertEqual(graph.get_vertex_labels(), labels)
+        self.assertEqual(graph.adjacency_matrix[labels.index("aa")][labels.index("a")], 5.0)
+        graph.remove_vertex("b")
+        self.assertEqual(graph.get_vertex_labels(), ["a", "aa", "c", "d"])
+        self.assertEqual(graph.adjacency_matrix, [[0, 5.0, 0, 0], [5.0, 0, 0, 0],
+                                                  [0, 0, 0, 3.0], [0, 0, 3.0, 0]])
+
+
+class ExportTest(unittest.TestCase):
+    def test_windows_are_clamped(self):
+        graph = Graph()
+        for u, v, weight in EDGES:
+            graph.add_edge(u, v, weight)
+        matrix = graph.adjacency_matrix
+        for rows, cols, expected_rows, expected_cols in (
+                (range(0, 10), range(-2, 3), range(4), range(3)),
+                (slice(1, 10), range(10, -5, -3), range(1, 4), range(1, -1, -3)),
+                (range(5, 9), None, range(0), range(4))):
+            out = io.StringIO()
+            graph.export_matrix(out, "adjacency", "csv", rows, cols)
+            lines = list(csv.reader(io.StringIO(out.getvalue())))
+            self.assertEqual(len(lines), len(expected_rows) + 1)
+            self.assertEqual([[float(x) for x in line[1:]] for line in lines[1:]],
+                             [[matrix[i][j] for j in expected_cols] for i in expected_rows])
+
+
+class BfsLevelsTest(unittest.TestCase):
+    def test_same_parents_with_and_without_numpy(self):
+        rnd = random.Random(25)
+        for directed in (False, True):
+            for trial in range(20):
+                graph = random_graph(rnd, directed, 30, 60)
+                sources = rnd.sample(graph.get_vertex_labels(), 2)
+                hops, parents = graph.bfs_levels(sources)
+                with mock.patch.object(graph_main, "np", None):
+                    self.assertEqual(graph.bfs_levels(sources), (hops, parents))
+                matrix = graph.adjacency_matrix
+                for i, label in enumerate(graph.get_vertex_labels()):
+                    if label in sources:
+                        self.assertEqual((hops[i], parents[i]), (0, -1))
+                    elif hops[i] > 0:
+                        self.assertEqual(hops[parents[i]], hops[i] - 1)
+                        self.assertNotEqual(matrix[parents[i]][i], 0)
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == "fork",
+                     "исполнители должны унаследовать graph_main, загруженный по пути")
+class ParallelTest(unittest.TestCase):
+    """
+    workers > 1 на малых графах: пороги распараллеливания снижены,
+    результат сравнивается с расчетом в текущем процессе
+    """
+    def test_all_pairs_shortest_paths(self):
+        rnd = random.Random(16)
+        for directed in (False, True):
+            graph = random_graph(rnd, directed, 40, 120)
+            expected = list(graph.all_pairs_shortest_paths(method="dijkstra"))
+            self.assertEqual(list(graph.all_pairs_shortest_paths(
+                workers=2, method="dijkstra", batch_size=3)), expected)
+
+    def test_boruvka(self):
+        rnd = random.Random(20)
+        with mock.patch.object(graph_main, "PARALLEL_EDGES", 1):
+            for directed in (False, True):
+                graph = random_graph(rnd, directed, 40, 120)
+                expected = graph.minimum_spanning_tree("boruvka", forest=True)
+                self.assertEqual(graph.minimum_spanning_tree("boruvka", forest=True,
+                                                             workers=2), expected)
+                self.assertEqual(sum(w for _, _, w in expected),
+                                 sum(w for _, _, w in graph.minimum_spanning_tree(forest=True)))
+
+    @unittest.skipIf(graph_main.np is None, "bfs_levels делит фронт только с NumPy")
+    def test_bfs_levels(self):
+        rnd = random.Random(25)
+        with mock.patch.object(graph_main, "PARALLEL_FRONTIER", 4):
+            for directed in (False, True):
+                graph = random_graph(rnd, directed, 60, 150)
+                sources = rnd.sample(graph.get_vertex_labels(), 3)
+                self.assertEqual(graph.bfs_levels(sources, workers=2),
+                                 graph.bfs_levels(sources))
+
+
+class MutationTest(unittest.TestCase):
+    """
+    После случайных add_edge/remove_edge/set_edge_weight/remove_vertex
+    поддерживаемые по месту структуры совпадают с графом, заново
+    построенным по edges
+    """
+    def rebuild(self, graph):
+        fresh = Graph(directed=graph.directed)
+        for label in graph.get_vertex_labels():
+            fresh.add_vertex(label)
+        for edge in graph.edges:
+            fresh.add_edge(*edge)
+        return fresh
+
+    def rows(self, graph, adjacency):
+        '''
+        Строки смежности по меткам: внутренние номера вершин у графов разные
+        '''
+        start, end, _, target, weight, edge = adjacency
+        labels = graph._labels
+        rows = []
+        for label in graph.get_vertex_labels():
+            u = graph._ids[label]
+            rows.append(sorted((labels[target[k]], weight[k], edge[k])
+                               for k in range(start[u], end[u])))
+        return rows
+
+    def check(self, graph):
+        fresh = self.rebuild(graph)
+        self.assertEqual(graph.get_vertex_labels(), fresh.get_vertex_labels())
+        self.assertEqual(graph.adjacency_matrix, fresh.adjacency_matrix)
+        self.assertEqual(graph.incidence_matrix, fresh.incidence_matrix)
+        for label in graph.get_vertex_labels():
+            self.assertEqual(graph.degree(label), fresh.degree(label))
+            self.assertEqual(graph.in_degree(label), fresh.in_degree(label))
+            self.assertEqual(graph.out_degree(label), fresh.out_degree(label))
+        self.assertEqual(self.rows(graph, graph._forward()),
+                         self.rows(fresh, fresh._forward()))
+        self.assertEqual(self.rows(graph, graph._reverse_arrays(full=True)),
+                         self.rows(fresh, fresh._reverse_arrays(full=True)))
+
+    def test_random_mutations(self):
+        rnd = random.Random(19)
+        for directed in (False, True):
+            for trial in range(20):
+                graph = Graph(directed=directed)
+                for step in range(80):
+                    if rnd.random() < 0.3:
+                        # Матрицы и обратная смежность построены заранее и
+                        # дальше обновляются по месту
+                        graph.adjacency_matrix
+                        graph.incidence_matrix
+                        graph._reverse_arrays()
+                    edges = graph.edges
+                    op = rnd.random()
+                    if op < 0.45 or not edges:
+                        graph.add_edge(str(rnd.randint(0, 9)), str(rnd.randint(0, 9)),
+                                       float(rnd.randint(1, 5)))
+                    elif op < 0.7:
+                        u, v, weight = rnd.choice(edges)
+                        graph.remove_edge(u, v, weight)
+                    elif op < 0.85:
+                        u, v, _ = rnd.choice(edges)
+                        graph.set_edge_weight(u, v, float(rnd.randint(1, 5)))
+                    else:
+                        graph.remove_vertex(rnd.choice(graph.get_vertex_labels()))
+                    self.check(graph)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+'''
+Проверки Tree, ArrayTree, ConcurrentTree и MappedTree (main.py).
+
+Запуск из корня репозитория:
+    python -m pytest tests
+'''
+from bisect import bisect_left, bisect_right, insort
+import importlib.util
+import io
+import math
+import os
+import random
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_module(name, path):
+    '''
+    Загрузка main.py из корня по пути: имя main занято Laba4/main.py
+    '''
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+tree_main = load_module("tree_main", "main.py")
+Tree = tree_main.Tree
+ConcurrentTree = tree_main.ConcurrentTree
+MappedTree = tree_main.MappedTree
+
+MODES = [(balanced, storage) for balanced in Tree.BALANCE_MODES
+         for storage in Tree.STORAGE_MODES]
+
+
+class TreeTest(unittest.TestCase):
+    def check(self, tree, keys):
+        '''
+        Сравнение дерева с отсортированным списком ключей
+        '''
+        self.assertEqual(list(tree.inorder()), keys)
+        self.assertEqual(tree.countNodes(), len(keys))
+        self.assertEqual(sorted(tree.preorder()), keys)
+        self.assertEqual(sorted(tree.level_order()), keys)
+        if tree.balanced == "avl":
+            self.assertLessEqual(tree.height(), 1.45 * math.log2(len(keys) + 2))
+        self.assertEqual(tree.min(), keys[0] if keys else None)
+        self.assertEqual(tree.max(), keys[-1] if keys else None)
+        for x in (-1, 0, 17, 50, 99, 100):
+            self.assertEqual(tree.rank(x), bisect_left(keys, x))
+            i = bisect_right(keys, x)
+            self.assertEqual(tree.floor(x), keys[i - 1] if i else None)
+            i = bisect_left(keys, x)
+            self.assertEqual(tree.ceiling(x), keys[i] if i < len(keys) else None)
+        for k in range(len(keys)):
+            self.assertEqual(tree.select(k), keys[k])
+        self.assertEqual(list(tree.range(20, 60)),
+                         keys[bisect_left(keys, 20):bisect_left(keys, 60)])
+        self.assertEqual(tree.count_range(20, 60),
+                         bisect_left(keys, 60) - bisect_left(keys, 20))
+
+    def test_random_add_delete(self):
+        rnd = random.Random(1)
+        for balanced, storage in MODES:
+            with self.subTest(balanced=balanced, storage=storage):
+                tree = Tree(balanced=balanced, storage=storage)
+                keys = []
+                for step in range(600):
+                    val = rnd.randint(0, 99)
+                    if rnd.random() < 0.55:
+                        tree.add(val)
+                        insort(keys, val)
+                    else:
+                        self.assertEqual(tree.delete(val), val in keys)
+                        if val in keys:
+                            keys.remove(val)
+                    if step % 50 == 0:
+                        self.check(tree, keys)
+                self.check(tree, keys)
+
+    def test_sorted_input_stays_balanced(self):
+        for storage in Tree.STORAGE_MODES:
+            tree = Tree(balanced="avl", storage=storage)
+            for val in range(1000):
+                tree.add(val)
+            self.assertLessEqual(tree.height(), 14)
+            for val in range(0, 1000, 2):
+                self.assertTrue(tree.delete(val))
+            self.check(tree, list(range(1, 1000, 2)))
+
+    def test_array_free_list_reuses_slots(self):
+        tree = Tree(balanced="avl", storage="array")
+        for val in range(100):
+            tree.add(val)
+        for val in range(0, 100, 3):
+            tree.delete(val)
+        slots = len(tree._keys)
+        for val in range(0, 100, 3):
+            tree.add(val)
+        self.assertEqual(len(tree._keys), slots)
+        self.check(tree, list(range(100)))
+
+    def test_from_iterable_and_extend(self):
+        rnd = random.Random(2)
+        for balanced, storage in MODES:
+            keys = [rnd.randint(0, 99) for _ in range(200)]
+            tree = Tree.from_iterable(keys[:100], balanced=balanced, storage=storage)
+            self.check(tree, sorted(keys[:100]))
+            tree.extend(keys[100:105])    # Малый пакет - по одному ключу
+            self.check(tree, sorted(keys[:105]))
+            tree.extend(keys[105:])       # Большой пакет - слияние и перестройка
+            self.check(tree, sorted(keys))
+
+    def test_empty_output(self):
+        for balanced, storage in MODES:
+            tree = Tree(balanced=balanced, storage=storage)
+            out = io.StringIO()
+            tree.DFS(out)
+            tree.BFS(out)
+            tree.prettyPrint(out)
+            self.assertEqual(out.getvalue(), "Дерево не существует\n" * 3)
+            self.assertEqual(tree.prettyLines(), [])
+            tree.extend([5, 3, 8])
+            self.assertEqual(tree.prettyLines(max_levels=0), ["... еще уровней: 2"])
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "tree.bin")
+
+    def test_save_load_round_trip(self):
+        rnd = random.Random(3)
+        keys = sorted(rnd.randint(-10 ** 12, 10 ** 12) for _ in range(300))
+        for balanced, storage in MODES:
+            tree = Tree.from_iterable(keys, balanced=balanced, storage=storage)
+            tree.save(self.path)
+            loaded = Tree.load(self.path, storage=storage)
+            self.assertEqual(type(loaded), type(tree))
+            self.assertEqual(loaded.balanced, balanced)
+            self.assertEqual(list(loaded.inorder()), keys)
+            with Tree.load(self.path, readonly=True) as mapped:
+                self.assertEqual(list(mapped.inorder()), keys)
+                self.assertEqual(mapped.countNodes(), len(keys))
+                self.assertEqual(mapped.select(7), keys[7])
+                self.assertEqual(mapped.rank(keys[7]), bisect_left(keys, keys[7]))
+                self.assertEqual(mapped.find(keys[5]), keys[5])
+                self.assertEqual(list(mapped.range(keys[10], keys[20])), keys[10:20])
+
+    def test_float_keys(self):
+        keys = [0.5, 1.25, 2.0, 3.75]
+        Tree.from_iterable(keys).save(self.path)
+        self.assertEqual(list(Tree.load(self.path).inorder()), keys)
+        with Tree.load(self.path, readonly=True) as mapped:
+            self.assertEqual(mapped.floor(2.5), 2.0)
+            self.assertEqual(mapped.ceiling(2.5), 3.75)
+
+    def test_close_with_open_range(self):
+        Tree.from_iterable(range(100)).save(self.path)
+        with Tree.load(self.path, readonly=True) as mapped:
+            page = mapped.range(10)
+            self.assertEqual([next(page) for _ in range(5)], [10, 11, 12, 13, 14])
+            keys = mapped.inorder()
+            next(keys)
+        self.assertIsNone(mapped._map)
+        self.assertTrue(mapped._file.closed)
+        with self.assertRaises(ValueError):
+            next(page)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b"not a snapshot at all")
+        with self.assertRaises(ValueError):
+            Tree.load(self.path)
+        with self.assertRaises(ValueError):
+            Tree.load(self.path, readonly=True)
+
+
+class ConcurrentTreeTest(unittest.TestCase):
+    def test_snapshot_survives_writes(self):
+        for balanced in Tree.BALANCE_MODES:
+            tree = ConcurrentTree(balanced=balanced)
+            tree.extend(range(0, 200, 2))
+            snap = tree.snapshot()
+            before = list(snap.inorder())
+            shape = list(snap.preorder())
+            for val in range(1, 200, 2):
+                tree.add(val)
+            for val in range(0, 200, 4):
+                tree.delete(val)
+            tree.extend(range(1000, 1100))
+            self.assertEqual(list(snap.inorder()), before)
+            self.assertEqual(list(snap.preorder()), shape)
+            self.assertEqual(snap.countNodes(), len(before))
+            expected = sorted(set(range(200)) - set(range(0, 200, 4))) + list(range(1000, 1100))
+            self.assertEqual(list(tree.inorder()), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()